@@ -5,54 +5,76 @@ import os
 from pathlib import Path
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use("Agg")  # headless
 import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+from matplotlib.markers import MarkerStyle
+
+from scripts._balance_kernel import encode_sides, run_balances
 
 STATE_DIR = Path(os.getenv("STATE_DIR") or (Path.cwd() / "state"))
 LEDGER    = STATE_DIR / "trades.csv"
 C30       = STATE_DIR / "candles_BTC-USD_30m.csv"
 C1        = STATE_DIR / "candles_BTC-USD_1m.csv"
 OUT       = STATE_DIR / "equity_compare.png"
+MAX_POINTS = 2000  # line series are strided down to about this many points
 
 START_CASH = float(os.getenv("STARTING_CASH", "10000") or 10000.0)
 START_BTC  = float(os.getenv("STARTING_BTC", "0") or 0.0)
 
-def _parse_ts_any(x):
-    if pd.isna(x) or (isinstance(x,str) and x.strip()==""):
-        return pd.NaT
-    try:
-        v = float(str(x).strip())
-        return pd.to_datetime(int(v), unit=("s" if v < 1e12 else "ms"), utc=True)
-    except Exception:
-        return pd.to_datetime(x, utc=True, errors="coerce")
+# Known ledger columns and their parse types; timestamp columns stay text
+LEDGER_DTYPES = {"side": "category", "source": "string", "reason": "string", "note": "string",
+                 "price": "float64", "qty_btc": "float64", "fee_usd": "float64", "confidence": "float64"}
+LEDGER_TS_COLS = ["ts", "ts_utc", "ts_dt"]
+
+def _parse_ts_any(s: pd.Series) -> pd.Series:
+    # epoch seconds (< 1e12) or ms per row; only non-numeric rows go through the string parser
+    v = np.trunc(pd.to_numeric(s, errors="coerce"))
+    ts = pd.to_datetime(v.where(v < 1e12), unit="s", utc=True, errors="coerce")
+    ts = ts.fillna(pd.to_datetime(v.where(v >= 1e12), unit="ms", utc=True, errors="coerce"))
+    rest = ts.isna() & v.isna()
+    if rest.any():
+        ts = ts.where(~rest, pd.to_datetime(s.where(rest), utc=True, errors="coerce"))
+    return ts
 
 def read_ledger(path: Path) -> pd.DataFrame:
     if not path.exists() or path.stat().st_size == 0:
         return pd.DataFrame()
-    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    def keep(c: str) -> bool:
+        lc = c.strip().lower()
+        return c.strip() in LEDGER_DTYPES or c.strip() in LEDGER_TS_COLS or "time" in lc or "date" in lc
+    dtype = {c: LEDGER_DTYPES.get(c.strip(), "string") for c in pd.read_csv(path, nrows=0).columns if keep(c)}
+    nums = {c: [""] for c, t in dtype.items() if t == "float64"}
+    try:
+        df = pd.read_csv(path, dtype=dtype, usecols=list(dtype), keep_default_na=False, na_values=nums, engine="c")
+    except ValueError:
+        # junk in a numeric column -> tolerant all-text read, coerced below
+        df = pd.read_csv(path, dtype=str, usecols=list(dtype), keep_default_na=False)
     df.columns = [c.strip() for c in df.columns]
     for c in df.columns:
-        if df[c].dtype == object:
-            df[c] = df[c].map(lambda v: v.strip() if isinstance(v,str) else v)
+        if pd.api.types.is_string_dtype(df[c]):
+            df[c] = df[c].str.strip()
 
+    # first usable timestamp column wins per row; only still-missing rows are parsed,
+    # and the scan stops as soon as every row has a timestamp
+    extra = [c for c in df.columns if "time" in c.lower() or "date" in c.lower()]
     ts = pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns, UTC]")
-    if "ts_dt" in df.columns:
-        ts = pd.to_datetime(df["ts_dt"], utc=True, errors="coerce")
-    if "ts_utc" in df.columns:
-        ts = ts.fillna(pd.to_datetime(df["ts_utc"], utc=True, errors="coerce"))
-    if "ts" in df.columns:
-        ts = ts.fillna(df["ts"].map(_parse_ts_any))
-    if ts.isna().any():
-        for cand in df.columns:
-            lc = cand.lower()
-            if "time" in lc or "date" in lc:
-                ts = ts.fillna(pd.to_datetime(df[cand], utc=True, errors="coerce"))
+    for cand in ["ts_dt", "ts_utc", "ts"] + extra:
+        if cand not in df.columns:
+            continue
+        miss = ts.isna()
+        if not miss.any():
+            break
+        raw = df.loc[miss, cand]
+        ts = ts.fillna(_parse_ts_any(raw) if cand == "ts" else pd.to_datetime(raw, utc=True, errors="coerce"))
 
     df["ts_dt"] = ts
     for c in ("price","qty_btc","fee_usd"):
         if c in df.columns:
             df[c] = pd.to_numeric(df[c], errors="coerce")
     if "side" in df.columns:
-        df["side"] = df["side"].astype(str).str.upper()
+        df["side"] = df["side"].astype(str).str.strip().str.upper()
 
     df = df.dropna(subset=["ts_dt"]).sort_values("ts_dt").reset_index(drop=True)
     return df
@@ -60,47 +82,32 @@ def read_ledger(path: Path) -> pd.DataFrame:
 def add_running(df: pd.DataFrame) -> pd.DataFrame:
     if df.empty:
         return df
-    cash, btc = START_CASH, START_BTC
-    cash_after, btc_after = [], []
-    for _, r in df.iterrows():
-        price = float(r.get("price") or 0.0)
-        qty   = float(r.get("qty_btc") or 0.0)
-        fee   = float(r.get("fee_usd") or 0.0)
-        side  = str(r.get("side","")).upper()
-        if side == "BUY":
-            cash -= price*qty + fee
-            btc  += qty
-        elif side == "SELL":
-            cash += price*qty - fee
-            btc  -= qty
-        cash_after.append(cash); btc_after.append(btc)
-    out = df.copy()
-    out["cash_after"] = cash_after
-    out["btc_after"]  = btc_after
-    return out
+    col = lambda c: df[c].to_numpy(dtype=float) if c in df.columns else np.zeros(len(df))
+    sides = encode_sides(df["side"].astype(str)) if "side" in df.columns else np.zeros(len(df), np.int8)
+    cash_after, btc_after = run_balances(sides, col("price"), col("qty_btc"), col("fee_usd"),
+                                         START_CASH, START_BTC)
+    # adds the columns in place (callers rebind the result); no copy of the ledger
+    df["cash_after"] = cash_after
+    df["btc_after"]  = btc_after
+    return df
 
 def read_candles() -> pd.DataFrame:
     path = C30 if C30.exists() else (C1 if C1.exists() else None)
     if path is None:
         return pd.DataFrame()
-    df = pd.read_csv(path, dtype=str, keep_default_na=False)
-    df.columns = [c.strip() for c in df.columns]
-    # pick a time column
-    tcol = None
-    for cand in ["ts_dt","ts_utc","time","timestamp","date","datetime","Time"]:
-        if cand in df.columns:
-            tcol = cand; break
-    if tcol is None:
+    # sniff the header only, then parse just the two columns we need
+    col_map = {c.strip().lower(): c for c in pd.read_csv(path, nrows=0).columns}
+    # pick a time column and a close/price column
+    tcol = next((col_map[k] for k in ("ts_dt","ts_utc","time","timestamp","date","datetime") if k in col_map), None)
+    pcol = next((col_map[k] for k in ("close","price","close_price","c") if k in col_map), None)
+    if tcol is None or pcol is None:
         return pd.DataFrame()
-    ts = pd.to_datetime(df[tcol], utc=True, errors="coerce")
 
-    # pick a close/price column
-    pcol = None
-    for cand in ["close","Close","price","Price","close_price","c"]:
-        if cand in df.columns:
-            pcol = cand; break
-    if pcol is None:
-        return pd.DataFrame()
+    try:
+        df = pd.read_csv(path, usecols=[tcol, pcol], dtype={tcol: str, pcol: "float64"}, engine="c")
+    except ValueError:
+        df = pd.read_csv(path, usecols=[tcol, pcol], dtype=str, keep_default_na=False)
+    ts = pd.to_datetime(df[tcol], utc=True, errors="coerce")
 
     out = pd.DataFrame({"ts_dt": ts, "price": pd.to_numeric(df[pcol], errors="coerce")})
     out = out.dropna().sort_values("ts_dt").reset_index(drop=True)
@@ -110,61 +117,66 @@ def resample_actual_to_prices(ledger_run: pd.DataFrame, px: pd.DataFrame) -> pd.
     # Forward-fill holdings (cash, btc) across candle timeline
     if ledger_run.empty or px.empty:
         return pd.DataFrame()
-    h = ledger_run[["ts_dt","cash_after","btc_after"]].copy()
-    # Avoid duplicate times for merge_asof
-    h = h.sort_values("ts_dt").drop_duplicates("ts_dt", keep="last")
-    px = px.sort_values("ts_dt")
-    m = pd.merge_asof(px, h, on="ts_dt", direction="backward")
+    # callers pass time-sorted frames; only sort/dedupe when that doesn't hold
+    h = ledger_run[["ts_dt","cash_after","btc_after"]]
+    if not h["ts_dt"].is_monotonic_increasing:
+        h = h.sort_values("ts_dt")
+    if not px["ts_dt"].is_monotonic_increasing:
+        px = px.sort_values("ts_dt")
+    # backward as-of: last ledger row at or before each candle (side="right" also picks
+    # the last of any duplicate ledger times, so no dedupe pass is needed)
+    i = np.searchsorted(h["ts_dt"].values.view("i8"), px["ts_dt"].values.view("i8"), side="right") - 1
+    has, i = i >= 0, np.maximum(i, 0)
+    m = px.reset_index(drop=True)
+    for c in ("cash_after", "btc_after"):
+        m[c] = np.where(has, h[c].to_numpy(dtype=float)[i], np.nan)
     # fill initial with starting balances if still NaN
-    m["cash_after"] = m["cash_after"].fillna(START_CASH)
-    m["btc_after"]  = m["btc_after"].fillna(START_BTC)
-    m["equity_actual"] = m["cash_after"] + m["btc_after"] * m["price"]
+    m = m.fillna({"cash_after": START_CASH, "btc_after": START_BTC})
+    m["equity_actual"] = m["cash_after"].to_numpy() + m["btc_after"].to_numpy() * m["price"].to_numpy()
     return m
 
-def compute_hodl(px: pd.DataFrame, start_time: pd.Timestamp) -> pd.Series:
-    if px.empty:
-        return pd.Series(dtype=float)
-    px = px[px["ts_dt"] >= start_time]
-    if px.empty:
-        return pd.Series(dtype=float)
-    first_price = float(px["price"].iloc[0])
-    total_btc   = START_BTC + (START_CASH / first_price)
-    return total_btc * px["price"]
+DAY_NS  = 24 * 3600 * 1_000_000_000
+WEEK_NS = 7 * DAY_NS
 
-def compute_weekly_dca(px: pd.DataFrame, start_time: pd.Timestamp, end_time: pd.Timestamp) -> pd.Series:
-    if px.empty:
+def compute_hodl(px: pd.DataFrame, px_ts_i8: np.ndarray, start_i8: int) -> pd.Series:
+    # px is time-sorted; px_ts_i8 is its ts_dt as int64 ns
+    i = int(np.searchsorted(px_ts_i8, start_i8, side="left"))
+    if i >= len(px):
         return pd.Series(dtype=float)
-    px = px[(px["ts_dt"] >= start_time) & (px["ts_dt"] <= end_time)].copy()
-    if px.empty:
+    price = px["price"].iloc[i:]
+    total_btc = START_BTC + (START_CASH / float(price.iat[0]))
+    return total_btc * price
+
+def compute_weekly_dca(px: pd.DataFrame, px_ts_i8: np.ndarray, start_i8: int, end_i8: int) -> pd.Series:
+    lo = int(np.searchsorted(px_ts_i8, start_i8, side="left"))
+    hi = int(np.searchsorted(px_ts_i8, end_i8, side="right"))
+    if lo >= hi:
         return pd.Series(dtype=float)
+    t = px_ts_i8[lo:hi]
+    price = px["price"].iloc[lo:hi]
 
     # how many weeks in span
-    weeks = max(1, int(np.ceil((px["ts_dt"].iloc[-1] - px["ts_dt"].iloc[0]).days / 7)) )
+    weeks = max(1, int(np.ceil(((t[-1] - t[0]) // DAY_NS) / 7)))
     weekly_budget = START_CASH / weeks
 
-    # schedule buy timestamps
-    schedule = [px["ts_dt"].iloc[0] + pd.Timedelta(days=7*i) for i in range(weeks)]
-    s = pd.DataFrame({"buy_time": schedule}).sort_values("buy_time")
-    # match to nearest candle at/after each scheduled time
-    px2 = px.copy()
-    px2 = px2.sort_values("ts_dt")
-    s = pd.merge_asof(s, px2.rename(columns={"ts_dt":"match_time"}), left_on="buy_time",
-                      right_on="match_time", direction="forward")
-    s = s.dropna(subset=["match_time","price"])
-
-    btc = START_BTC
-    spent = 0.0
-    for _, r in s.iterrows():
-        p = float(r["price"])
-        qty = weekly_budget / p
-        btc += qty
-        spent += weekly_budget
+    # schedule buy timestamps, each matched to the first candle at/after it
+    j = np.searchsorted(t, t[0] + WEEK_NS * np.arange(weeks), side="left")
+    p = price.to_numpy()[j[j < len(t)]]
+    p = p[~np.isnan(p)]
+
+    # running sums seeded like the sequential loop so rounding is unchanged
+    btc = np.cumsum(np.r_[START_BTC, weekly_budget / p])[-1]
+    spent = np.cumsum(np.r_[0.0, np.full(len(p), weekly_budget)])[-1]
 
     # equity through time = btc * price + remaining cash
     remaining = START_CASH - spent
-    eq = btc * px["price"] + remaining
-    eq.index = px.index
-    return eq
+    return btc * price + remaining
+
+def _nearest_idx(t_ref: np.ndarray, t: np.ndarray) -> np.ndarray:
+    # index of the nearest t_ref (sorted int64 ns) for each t; ties go to the earlier row
+    idx = np.searchsorted(t_ref, t).clip(0, len(t_ref) - 1)
+    left = (idx - 1).clip(0)
+    return np.where(np.abs(t - t_ref[left]) <= np.abs(t_ref[idx] - t), left, idx)
 
 def main():
     ledger = read_ledger(LEDGER)
@@ -183,39 +195,51 @@ def main():
     end   = max(ledger["ts_dt"].iloc[-1], px["ts_dt"].iloc[-1])
 
     actual = resample_actual_to_prices(ledger, px)
-    hodl   = compute_hodl(px, start)
-    dca    = compute_weekly_dca(px, start, end)
-
-    # Plot
-    fig = plt.figure(figsize=(12,5.5))
-    # actual
-    plt.plot(actual["ts_dt"], actual["equity_actual"], label="Actual (LLM/manual)")
-    # baselines
+    px_ts_i8 = px["ts_dt"].values.view("i8")
+    start_i8, end_i8 = start.value, end.value
+    hodl   = compute_hodl(px, px_ts_i8, start_i8)
+    dca    = compute_weekly_dca(px, px_ts_i8, start_i8, end_i8)
+
+    # Plot: one date2num'd x shared by all series; baselines aligned to actual's (candle) rows
+    fig, ax = plt.subplots(figsize=(12,5.5))
+    x = mdates.date2num(actual["ts_dt"].to_numpy())
+    series = [("Actual (LLM/manual)", actual["equity_actual"].to_numpy())]
     if not hodl.empty:
-        plt.plot(px.loc[hodl.index, "ts_dt"], hodl.values, label="Buy & Hold")
+        series.append(("Buy & Hold", hodl.reindex(px.index).to_numpy()))
     if not dca.empty:
-        plt.plot(px.loc[dca.index, "ts_dt"], dca.values, label="Weekly DCA")
+        series.append(("Weekly DCA", dca.reindex(px.index).to_numpy()))
+    step = max(1, len(x) // MAX_POINTS)
+    ax.plot(x[::step], np.column_stack([v for _, v in series])[::step], label=[k for k, _ in series])
+    ax.xaxis_date()
 
     # mark buy/sell points
     buys  = ledger[ledger["side"]=="BUY"]
     sells = ledger[ledger["side"]=="SELL"]
-    # place markers at their nearest actual equity value
-    if not buys.empty:
-        b_asof = pd.merge_asof(buys[["ts_dt"]].sort_values("ts_dt"),
-                               actual[["ts_dt","equity_actual"]].sort_values("ts_dt"),
-                               on="ts_dt", direction="nearest")
-        plt.scatter(b_asof["ts_dt"], b_asof["equity_actual"], marker="^", label="BUY")
-    if not sells.empty:
-        s_asof = pd.merge_asof(sells[["ts_dt"]].sort_values("ts_dt"),
-                               actual[["ts_dt","equity_actual"]].sort_values("ts_dt"),
-                               on="ts_dt", direction="nearest")
-        plt.scatter(s_asof["ts_dt"], s_asof["equity_actual"], marker="v", label="SELL")
-
-    plt.title("Equity Curve vs Baselines")
-    plt.xlabel("Time (UTC)")
-    plt.ylabel("Equity (USD)")
-    plt.grid(True, alpha=0.3)
-    plt.legend()
+    # place markers at their nearest actual equity value (actual is already time-sorted)
+    t_actual = actual["ts_dt"].values.view("i8")
+    eq = actual["equity_actual"].to_numpy()
+    # both sides go into a single scatter PathCollection (per-point marker path + colour).
+    # Colours are what one scatter per side drew: scatter's own cycle, which the lines don't advance.
+    marks = [(df, m, lbl) for df, m, lbl in ((buys, "^", "BUY"), (sells, "v", "SELL")) if not df.empty]
+    if marks:
+        paths, offsets, colors = [], [], []
+        for i, (df, m, lbl) in enumerate(marks):
+            c = f"C{i}"
+            ms = MarkerStyle(m)
+            idx = _nearest_idx(t_actual, df["ts_dt"].values.view("i8"))
+            offsets.append(np.column_stack([mdates.date2num(df["ts_dt"].to_numpy()), eq[idx]]))
+            paths += [ms.get_path().transformed(ms.get_transform())] * len(df)
+            colors += [c] * len(df)
+            # one collection can carry only one legend entry, so each side gets an empty marker-only line
+            ax.plot([], [], marker=m, color=c, linestyle="None", label=lbl)
+        xy = np.concatenate(offsets)
+        ax.scatter(xy[:, 0], xy[:, 1], c=colors).set_paths(paths)
+
+    ax.set_title("Equity Curve vs Baselines")
+    ax.set_xlabel("Time (UTC)")
+    ax.set_ylabel("Equity (USD)")
+    ax.grid(True, alpha=0.3)
+    ax.legend()
     fig.tight_layout()
     OUT.parent.mkdir(parents=True, exist_ok=True)
     fig.savefig(OUT, dpi=144)
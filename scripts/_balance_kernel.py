@@ -0,0 +1,46 @@
+# scripts/_balance_kernel.py
+# Running cash/BTC balances over a trade ledger (buy: -notional-fee / +qty, sell: +notional-fee / -qty).
+# Compiled with numba when it is installed; otherwise a NumPy cumsum gives the same result.
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+def encode_sides(side) -> np.ndarray:
+    """1 = buy, -1 = sell, 0 = anything else (case-insensitive)."""
+    s = np.char.lower(np.asarray(side, dtype=str))
+    return np.where(s == "buy", 1, np.where(s == "sell", -1, 0)).astype(np.int8)
+
+def _run_balances_loop(sides, price, qty, fee, cash0, btc0):
+    n = sides.shape[0]
+    cash = np.empty(n)
+    btc = np.empty(n)
+    c, b = cash0, btc0
+    for i in range(n):
+        if sides[i] == 1:
+            c -= price[i] * qty[i] + fee[i]
+            b += qty[i]
+        elif sides[i] == -1:
+            c += price[i] * qty[i] - fee[i]
+            b -= qty[i]
+        cash[i] = c
+        btc[i] = b
+    return cash, btc
+
+def _run_balances_np(sides, price, qty, fee, cash0, btc0):
+    buy, sell = sides == 1, sides == -1
+    notional = price * qty
+    d_cash = np.where(buy, -(notional + fee), np.where(sell, notional - fee, 0.0))
+    d_btc = np.where(buy, qty, np.where(sell, -qty, 0.0))
+    # seed the cumsum with the opening balance so rounding matches the sequential loop
+    return np.cumsum(np.r_[cash0, d_cash])[1:], np.cumsum(np.r_[btc0, d_btc])[1:]
+
+_kernel = njit(cache=True)(_run_balances_loop) if njit else _run_balances_np
+
+def run_balances(sides, price, qty, fee, cash0, btc0):
+    """Balances after each row -> (cash_after, btc_after) float64 arrays."""
+    f8 = lambda a: np.ascontiguousarray(a, dtype=np.float64)
+    return _kernel(np.ascontiguousarray(sides, dtype=np.int8), f8(price), f8(qty), f8(fee),
+                   float(cash0), float(btc0))
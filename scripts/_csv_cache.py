@@ -0,0 +1,39 @@
+# scripts/_csv_cache.py
+# Parsed-CSV memo shared by the report scripts: a hidden parquet next to the source CSV,
+# named .{stem}.{tag}.parquet (tag = the reader, so different parses never share a file).
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+def cache_path(path, tag: str) -> Path:
+    p = Path(path)
+    return p.with_name(f".{p.stem}.{tag}.parquet")
+
+def none_to_nan(df: pd.DataFrame) -> pd.DataFrame:
+    """Object columns: None (pyarrow / parquet string nulls) -> NaN, as the C engine reads them."""
+    obj = df.columns[df.dtypes == object]
+    df[obj] = df[obj].where(df[obj].notna(), np.nan)
+    return df
+
+def cached_read(path, tag: str, parse, extra=None) -> pd.DataFrame:
+    """parse(path), memoized while the CSV's mtime/size (and extra(df), if given) are unchanged."""
+    st = os.stat(path)
+    stamp = f"{st.st_mtime_ns}:{st.st_size}"
+    key = (lambda df: stamp) if extra is None else (lambda df: f"{stamp}|{extra(df)}")
+    cache = cache_path(path, tag)
+    if cache.exists():
+        try:
+            cached = pd.read_parquet(cache)
+        except Exception:
+            cached = None  # no parquet engine / unreadable cache -> parse again
+        if cached is not None and cached.attrs.get("key") == key(cached):
+            return none_to_nan(cached)
+    df = parse(path)
+    df.attrs["key"] = key(df)
+    try:
+        df.to_parquet(cache, index=False)
+    except Exception:
+        pass  # cache is best-effort
+    return df
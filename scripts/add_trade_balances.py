@@ -3,6 +3,11 @@ import numpy as np
 import pandas as pd
 from pandas.api.types import is_numeric_dtype, is_datetime64_any_dtype
 
+try:
+    from scripts._balance_kernel import encode_sides, run_balances
+except ImportError:
+    from _balance_kernel import encode_sides, run_balances  # type: ignore
+
 STATE_DIR = os.path.join(".", "state")
 TRADES_CSV = os.path.join(STATE_DIR, "trades.csv")
 EQUITY_CSV = os.path.join(STATE_DIR, "equity_history.csv")
@@ -11,43 +16,62 @@ OUT_HTML   = os.path.join(STATE_DIR, "weekly_report_with_balances.html")
 
 TS_TRADES = ["ts_dt","ts_utc","timestamp","date","datetime","ts","time","created_at"]
 TS_EQUITY = ["ts_utc","ts_dt","date","timestamp","datetime","ts"]
+NUM_COLS  = {"price","fill_price","avg_price","executed_price","close","qty_btc","size_btc","amount_btc",
+             "qty","size","amount","fee_usd","fee","commission","fee_quote","cash_usd","cash","btc","equity"}
 
 def pick_first(df, names):
-    for n in names:
-        if n in df.columns: return n
-    return None
+    col_map = {str(c).lower(): c for c in df.columns}
+    return next((col_map[n] for n in names if n in col_map), None)
+
+def read_csv_typed(path, ts_names=()):
+    # declare float64 for known numeric columns so the parser skips inference on them;
+    # the timestamp column is handed to parse_dates (epoch columns come back as text)
+    cols = pd.read_csv(path, nrows=0).columns
+    dtype = {c: "float64" for c in cols if c.strip().lower() in NUM_COLS}
+    ts = next((c for n in ts_names for c in cols if c.strip().lower() == n), None)
+    try:
+        return pd.read_csv(path, dtype=dtype, parse_dates=[ts] if ts else False, engine="c")
+    except ValueError:
+        return pd.read_csv(path)
 
 def to_utc_naive_from_strings(s):
     s = pd.to_datetime(s, utc=True, errors="coerce")
     return s.dt.tz_convert("UTC").dt.tz_localize(None)
 
 def parse_epoch_numeric(vals: pd.Series) -> pd.Series:
-    v = pd.to_numeric(vals, errors="coerce")
-    vmax = v.max()
-
-    if vmax > 1e17:   unit, _v = "ns", v
-    elif vmax > 1e14: unit, _v = "us", v
-    elif vmax > 1e11: unit, _v = "ms", v
-    elif vmax > 1e8:  unit, _v = "s",  v
-    else:
-        if 1 < vmax < 10:   # seconds divided by 1e9 (odd case)
-            unit, _v = "s", (v * 1_000_000_000.0)
-        else:
-            return to_utc_naive_from_strings(vals.astype(str))
-
-    dt = pd.to_datetime(_v, unit=unit, utc=True, errors="coerce")
-    return dt.dt.tz_convert("UTC").dt.tz_localize(None)
+    # unit is picked per row from its magnitude, so a few odd rows don't force the whole
+    # column down the string path
+    num = pd.to_numeric(vals, errors="coerce")
+    raw = num.to_numpy()
+    v = raw.astype("float64", copy=False)
+    unit = np.select([v > 1e17, v > 1e14, v > 1e11, v > 1e8, (v > 1) & (v < 10)],
+                     ["ns", "us", "ms", "s", "s1e9"], default="")
+    out = np.full(len(v), np.datetime64("NaT"), dtype="datetime64[ns]")
+    for u in ("ns", "us", "ms", "s", "s1e9"):
+        m = unit == u
+        if m.any():
+            x = raw[m] * 1_000_000_000.0 if u == "s1e9" else raw[m]   # seconds divided by 1e9 (odd case)
+            dt = pd.to_datetime(x, unit=u[0] if u == "s1e9" else u, utc=True, errors="coerce")
+            out[m] = dt.tz_localize(None).to_numpy()
+    rest = (unit == "") & vals.notna().to_numpy()
+    if rest.any():
+        out[rest] = to_utc_naive_from_strings(vals[rest].astype(str)).to_numpy()
+    return pd.Series(out, index=vals.index)
 
 def parse_maybe_epoch(series: pd.Series) -> pd.Series:
+    if is_datetime64_any_dtype(series):   # already parsed by read_csv
+        return series.dt.tz_convert("UTC").dt.tz_localize(None) if series.dt.tz is not None else series
     if is_numeric_dtype(series):
         return parse_epoch_numeric(series)
-    else:
-        return to_utc_naive_from_strings(series)
+    num = pd.to_numeric(series, errors="coerce")
+    if num.notna().any() and num.notna().sum() == series.notna().sum():
+        return parse_epoch_numeric(num)   # all-epoch column left as text by parse_dates
+    return to_utc_naive_from_strings(series)
 
 def load_trades(path):
     if not os.path.exists(path):
         sys.exit(f"? Missing {path}")
-    t = pd.read_csv(path)
+    t = read_csv_typed(path, TS_TRADES)
     t.columns = [c.strip().lower() for c in t.columns]
 
     raw_ts = pick_first(t, TS_TRADES)
@@ -80,7 +104,7 @@ def load_trades(path):
 def load_equity(path):
     if not os.path.exists(path):
         sys.exit(f"? Missing {path}")
-    eh = pd.read_csv(path)
+    eh = read_csv_typed(path, TS_EQUITY)
     eh.columns = [c.strip().lower() for c in eh.columns]
 
     raw = pick_first(eh, TS_EQUITY)
@@ -136,18 +160,8 @@ def main():
 
     # Build balances through trades
     cash0, btc0 = starting_balances(eh, dt_col, first_trade_ts, have_trade_time) if len(t) else (np.nan, np.nan)
-    cash, btc = cash0, btc0
-    cash_bal, btc_bal = [], []
-    for _, r in t.iterrows():
-        side = (r.get("side","") or "").lower()
-        price = float(r[price_col]); qty = float(r[qty_col]); fee = float(r[fee_col])
-        if side == "buy":
-            cash -= price * qty + fee
-            btc  += qty
-        elif side == "sell":
-            cash += price * qty - fee
-            btc  -= qty
-        cash_bal.append(cash); btc_bal.append(btc)
+    cash_bal, btc_bal = run_balances(encode_sides(t["side"].fillna("")), t[price_col], t[qty_col], t[fee_col],
+                                     cash0, btc0)
 
     insert_at = t.columns.get_loc(fee_col) + 1 if fee_col in t.columns else len(t.columns)
     if len(t):
@@ -167,43 +181,46 @@ def main():
     seven_days_ago = as_of_ts - pd.Timedelta(days=7)
 
     # Portfolio snapshot (prefer equity file)
-    latest_eh = eh.iloc[-1] if len(eh) else None
-    cash_now = float(latest_eh.get("cash_usd", np.nan)) if latest_eh is not None else (cash_bal[-1] if cash_bal else np.nan)
-    btc_now  = float(latest_eh.get("btc", np.nan))      if latest_eh is not None else (btc_bal[-1] if btc_bal else np.nan)
+    last = len(eh) - 1 if len(eh) else None
+    def at(col, i):
+        return float(eh[col].iat[i]) if col in eh.columns else np.nan
+    cash_now = at("cash_usd", last) if last is not None else (cash_bal[-1] if len(cash_bal) else np.nan)
+    btc_now  = at("btc", last)      if last is not None else (btc_bal[-1] if len(btc_bal) else np.nan)
 
     # Equity delta 7d (prefer equity column; else compute if price available)
-    def equity_from_row(row):
-        if row is None: return np.nan
-        if "equity" in row.index: return float(row["equity"])
-        price_col_eh = "price" if "price" in row.index else ("close" if "close" in row.index else None)
-        if price_col_eh and ("cash_usd" in row.index or "cash" in row.index) and "btc" in row.index:
-            cashv = float(row.get("cash_usd", row.get("cash", np.nan)))
-            return cashv + float(row["btc"]) * float(row[price_col_eh])
+    eq_col  = "equity" if "equity" in eh.columns else None
+    px_eh   = pick_first(eh, ["price","close"])
+    cash_eh = pick_first(eh, ["cash_usd","cash"])
+    def equity_at(i):
+        if i is None: return np.nan
+        if eq_col: return at(eq_col, i)
+        if px_eh and cash_eh and "btc" in eh.columns:
+            return at(cash_eh, i) + at("btc", i) * at(px_eh, i)
         return np.nan
 
-    now_e = equity_from_row(latest_eh)
-    prev_idx = eh[eh[dt_col] <= seven_days_ago].index
-    prev_row = eh.loc[prev_idx[-1]] if len(prev_idx) else (eh.iloc[0] if len(eh) else None)
-    prev_e = equity_from_row(prev_row)
+    now_e = equity_at(last)
+    n_prev = int((eh[dt_col] <= seven_days_ago).sum())  # eh is sorted by dt_col
+    prev_e = equity_at(n_prev - 1 if n_prev else (0 if len(eh) else None))
     eq_delta_7d = now_e - prev_e if (pd.notna(now_e) and pd.notna(prev_e)) else np.nan
 
     # Trades (7d)
     t7 = t[t[ts_col] >= seven_days_ago] if len(t) else t
-    buys  = (t7["side"] == "buy").sum()  if "side" in t7.columns else 0
-    sells = (t7["side"] == "sell").sum() if "side" in t7.columns else 0
+    side7 = t7["side"].to_numpy() if "side" in t7.columns else np.array([], dtype=object)
+    is_buy, is_sell = side7 == "buy", side7 == "sell"
+    notional = t7[price_col].to_numpy() * t7[qty_col].to_numpy() if len(t7) else np.zeros(0)
+    buys, sells = int(is_buy.sum()), int(is_sell.sum())
     total = len(t7)
-    buy_notional  = float((t7.loc[t7["side"]=="buy",  price_col] * t7.loc[t7["side"]=="buy",  qty_col]).sum()) if len(t7) else 0.0
-    sell_notional = float((t7.loc[t7["side"]=="sell", price_col] * t7.loc[t7["side"]=="sell", qty_col]).sum()) if len(t7) else 0.0
+    buy_notional  = float(notional[is_buy].sum())  if len(t7) else 0.0
+    sell_notional = float(notional[is_sell].sum()) if len(t7) else 0.0
 
     # ===== HTML =====
-    view = t.copy()
-    if len(view):
-        view["ts_dt"] = view["ts_dt"].dt.strftime("%Y-%m-%d %H:%M")
-        if price_col in view:            view[price_col] = view[price_col].map(lambda v: fmt_money(v, 2))
-        if qty_col in view:              view[qty_col] = view[qty_col].map(lambda v: fmt_money(v, 6))
-        if fee_col in view:              view[fee_col] = view[fee_col].map(lambda v: fmt_money(v, 2))
-        if "cash_balance_usd" in view:   view["cash_balance_usd"] = view["cash_balance_usd"].map(lambda v: fmt_money(v, 2))
-        if "btc_balance" in view:        view["btc_balance"] = view["btc_balance"].map(lambda v: fmt_money(v, 6))
+    # formatting is done by to_html itself: no copy of t, no per-column .map
+    money = lambda v: fmt_money(v, 2)
+    btc6  = lambda v: fmt_money(v, 6)
+    formatters = {c: f for c, f in [(price_col, money), (qty_col, btc6), (fee_col, money),
+                                    ("cash_balance_usd", money), ("btc_balance", btc6)] if c in t.columns}
+    if len(t):
+        formatters["ts_dt"] = lambda d: d.strftime("%Y-%m-%d %H:%M")
 
     parts = []
     parts.append("<style>body{font-family:Segoe UI,Arial,sans-serif} table{border-collapse:collapse} th,td{border:1px solid #ddd;padding:6px} th{background:#f4f6f8} h2{margin-bottom:4px}</style>")
@@ -229,10 +246,10 @@ def main():
     # Full table (all trades) with balances
     parts.append("<h3>Trades with Post-Trade Balances</h3>")
     parts.append("<p>Balances reflect holdings immediately <b>after</b> each execution.</p>")
-    parts.append(view.to_html(index=False, escape=False))
 
     with open(OUT_HTML, "w", encoding="utf-8") as f:
-        f.write("\n".join(parts))
+        f.write("\n".join(parts) + "\n")
+        t.to_html(buf=f, index=False, escape=False, formatters=formatters)
 
     print("OK wrote:", OUT_CSV)
     print("OK wrote:", OUT_HTML)
@@ -1,66 +1,84 @@
 ﻿# scripts/append_trade.py
-import os, csv, time
+import os, io, csv, time
 from pathlib import Path
 from datetime import datetime, timezone, timedelta
-import pandas as pd
 
 STATE_DIR = os.getenv("STATE_DIR", "state")
 TRADES_CSV = os.path.join(STATE_DIR, "trades.csv")
 
 COLUMNS = ["ts","side","source","reason","price","qty_btc","fee_usd","note","confidence"]
+TAIL_BYTES = 64 * 1024   # comfortably covers the last ~100 rows
 
-def _ensure_header():
-    Path(STATE_DIR).mkdir(parents=True, exist_ok=True)
-    if not Path(TRADES_CSV).exists() or os.path.getsize(TRADES_CSV) == 0:
-        with open(TRADES_CSV, "w", newline="", encoding="utf-8") as f:
-            csv.writer(f).writerow(COLUMNS)
+def _tail_rows(path, n=100):
+    """Lower-cased header and the last n rows, reading only the tail of the file."""
+    with open(path, "rb") as f:
+        header = f.readline()
+        start = max(f.tell(), os.fstat(f.fileno()).st_size - TAIL_BYTES)
+        f.seek(start)
+        tail = f.read().decode("utf-8", errors="ignore")
+    if start > len(header):
+        tail = tail[tail.find("\n") + 1:]  # drop the partial first line
+    hdr = next(csv.reader([header.decode("utf-8-sig", errors="ignore")]), [])
+    rows = [r for r in csv.reader(io.StringIO(tail)) if r]
+    return [c.strip().lower() for c in hdr], rows[-n:]
+
+def _parse_ts(s):
+    try:
+        t = datetime.fromisoformat(str(s).strip())
+    except ValueError:
+        return None
+    return t if t.tzinfo else t.replace(tzinfo=timezone.utc)
+
+def _as_float(v, default=-1.0):
+    try:
+        return float(v)
+    except ValueError:
+        return default
 
 def _now_utc_iso():
     return datetime.now(timezone.utc).replace(microsecond=0).isoformat()
 
+def _is_near_duplicate(ts, side, source, reason, price, qty_btc):
+    # only the last rows can fall inside the ±5s window
+    hdr, rows = _tail_rows(TRADES_CSV)
+    col = {c: i for i, c in enumerate(hdr)}
+    i_ts = col.get("ts", col.get("ts_utc"))
+    i_qty = col.get("qty_btc", col.get("qty"))
+    t_new = _parse_ts(ts)
+    if t_new is None or i_ts is None:
+        return False
+    def cell(r, i):
+        return r[i] if i is not None and i < len(r) else ""
+    for r in reversed(rows):
+        t = _parse_ts(cell(r, i_ts))
+        if t is None or abs((t - t_new).total_seconds()) > 5:
+            continue
+        if (cell(r, col.get("side")).lower() == str(side).lower()
+                and cell(r, col.get("source")) == str(source)
+                and cell(r, col.get("reason")) == str(reason)
+                and _as_float(cell(r, col.get("price"))) == float(price)
+                and _as_float(cell(r, i_qty)) == float(qty_btc)):
+            return True
+    return False
+
 def append_trade(*, side, source="", reason="", price=0.0, qty_btc=0.0, fee_usd=0.0, note="", confidence=None, ts_utc=None):
-    _ensure_header()
     ts = ts_utc or _now_utc_iso()
+    Path(STATE_DIR).mkdir(parents=True, exist_ok=True)
 
-    # load and check for near-duplicate (±5s)
-    try:
-        df = pd.read_csv(TRADES_CSV, dtype=str)
-    except Exception:
-        df = pd.DataFrame(columns=COLUMNS)
-    if not df.empty:
-        df.columns = [c.strip().lower() for c in df.columns]
-        if "ts" not in df.columns and "ts_utc" in df.columns:
-            df["ts"] = df["ts_utc"]
-        df["_ts"] = pd.to_datetime(df["ts"], utc=True, errors="coerce")
-        t_new = pd.to_datetime(ts, utc=True, errors="coerce")
-        window = (df["_ts"] >= t_new - timedelta(seconds=5)) & (df["_ts"] <= t_new + timedelta(seconds=5))
-        same = (
-            window
-            & (df.get("side","").str.lower().fillna("") == str(side).lower())
-            & (df.get("source","").fillna("") == str(source))
-            & (df.get("reason","").fillna("") == str(reason))
-            & (pd.to_numeric(df.get("price"), errors="coerce").fillna(-1) == float(price))
-            & (pd.to_numeric(df.get("qty_btc", df.get("qty")), errors="coerce").fillna(-1) == float(qty_btc))
-        )
-        if same.any():
+    # one open for create/append; an empty file (new or truncated) gets the header first
+    fd = os.open(TRADES_CSV, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    with open(fd, "a", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        if os.fstat(fd).st_size == 0:
+            w.writerow(COLUMNS)
+        elif _is_near_duplicate(ts, side, source, reason, price, qty_btc):
             print("[append_trade] skipped: near-duplicate within ±5s")
             return
 
-    row = {
-        "ts": ts,
-        "side": str(side).lower(),
-        "source": source,
-        "reason": reason,
-        "price": float(price),
-        "qty_btc": float(qty_btc),
-        "fee_usd": float(fee_usd),
-        "note": note,
-        "confidence": ("" if confidence is None else float(confidence)),
-    }
-    with open(TRADES_CSV, "a", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=COLUMNS)
+        row = [ts, str(side).lower(), source, reason, float(price), float(qty_btc), float(fee_usd),
+               note, ("" if confidence is None else float(confidence))]
         w.writerow(row)
-    print("[append_trade] appended:", row)
+    print("[append_trade] appended:", dict(zip(COLUMNS, row)))
 
 if __name__ == "__main__":
     import argparse
@@ -1,11 +1,30 @@
-import os, pandas as pd, numpy as np
+import os, re, pandas as pd, numpy as np
+from pandas.api.types import is_bool_dtype, is_integer_dtype, is_numeric_dtype
 
 EQ = r".\state\equity_history.csv"
 TR = r".\state\trades.csv"
 
+_NOT_MONEY = re.compile(r"[^\d\.\-eE]")
+
+def _strip_parse(s):
+    return pd.to_numeric(s.astype(str).str.replace(_NOT_MONEY, "", regex=True), errors="coerce")
+
 def clean_money(s):
-    s = s.astype(str).str.replace(r"[^\d\.\-eE]", "", regex=True)
-    return pd.to_numeric(s, errors="coerce")
+    # most cells parse as-is; only the rest ("$", ",", text, and inf/nan, which the
+    # strip empties to NaN) go through the regex strip
+    if s.empty or is_bool_dtype(s):
+        return _strip_parse(s)
+    v = s if is_numeric_dtype(s) else pd.to_numeric(s, errors="coerce")
+    bad = ~np.isfinite(v.to_numpy(dtype=np.float64)) & s.notna().to_numpy()
+    if bad.any():
+        fixed = _strip_parse(s[bad])
+        v = v.astype(np.float64)   # a copy: the caller's column is left alone
+        v[bad] = fixed
+        # a whole-column parse comes out int64 when every cleaned cell is an integer
+        if (is_integer_dtype(fixed) and s.notna().all()
+                and is_integer_dtype(pd.to_numeric(s[~bad], errors="coerce"))):
+            v = v.astype(np.int64)
+    return v
 
 assert os.path.exists(EQ), f"Missing {EQ}"
 eq = pd.read_csv(EQ)
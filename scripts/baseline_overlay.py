@@ -1,23 +1,72 @@
 ﻿# scripts/baseline_overlay.py  — lean overlay
 # Env:
 #   STATE_DIR=state (default) | OVERLAY_DAYS="all" or int days | DCA_USD="300"
+#   OVERLAY_DAEMON=<seconds>: stay running and re-render every N seconds (default 0 = run once)
 
+import csv
+import hashlib
+import io
 import os
+import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Tuple
+from typing import Optional, Tuple
 
 import numpy as np
 import pandas as pd
+from pandas._libs.parsers import STR_NA_VALUES
+import matplotlib
+matplotlib.use("Agg", force=True)  # file output only; never a GUI backend, even if one is configured
 import matplotlib.pyplot as plt
 
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+try:
+    from scripts._balance_kernel import run_balances
+    from scripts._csv_cache import cache_path, cached_read, none_to_nan
+except ImportError:
+    from _balance_kernel import run_balances  # type: ignore
+    from _csv_cache import cache_path, cached_read, none_to_nan  # type: ignore
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:
+    pa = None
+
 STATE_DIR  = os.getenv("STATE_DIR", "state")
 EQ_CSV     = os.path.join(STATE_DIR, "equity_history.csv")
 TRADES_CSV = os.path.join(STATE_DIR, "trades.csv")
 DCA_LOT    = float(os.getenv("DCA_USD", "300"))
 OVERLAY    = (os.getenv("OVERLAY_DAYS", "all") or "all").strip().lower()
+WEEK_NS    = 7 * 24 * 3600 * 1_000_000_000
+DAEMON_SECS = int(os.getenv("OVERLAY_DAEMON", "0") or 0)
+
+def _overlay_days(v: str) -> Optional[int]:
+    if v == "all":
+        return None
+    try:
+        return int(v)
+    except ValueError:
+        return 30
+
+OVERLAY_DAYS = _overlay_days(OVERLAY)   # None = whole history
 
 # ---------- helpers ----------
+def _utc_if_parsed(s: pd.Series) -> Optional[pd.Series]:
+    # tz-aware columns (pyarrow-inferred, parquet caches, already-enriched frames) only need a
+    # zone check, not another pass through pd.to_datetime
+    if isinstance(s.dtype, pd.DatetimeTZDtype):
+        return s if str(s.dt.tz) == "UTC" else s.dt.tz_convert("UTC")
+    return None
+
 def ensure_utc(s: pd.Series) -> pd.Series:
+    fast = _utc_if_parsed(s)
+    if fast is not None:
+        return fast
     s = pd.to_datetime(s, errors="coerce")
     if getattr(s.dt, "tz", None) is None:
         s = s.dt.tz_localize("UTC")
@@ -25,41 +74,31 @@ def ensure_utc(s: pd.Series) -> pd.Series:
         s = s.dt.tz_convert("UTC")
     return s
 
-def equity_at(ts: pd.Timestamp, eq: pd.DataFrame) -> float:
-    i = int(eq["ts"].searchsorted(ts, side="right")) - 1
-    i = max(0, min(i, len(eq) - 1))
-    return float(eq["equity"].iloc[i])
-
-def _as_float(v, default=0.0):
-    try:
-        return float(v)
-    except Exception:
-        return float(default)
-
-def _source_from_row(r) -> str:
-    # prefer explicit 'source', else derive from reason
-    src = str(r.get("source", "") or "").strip()
-    if src:
-        return src.upper()
-    rsn = str(r.get("reason", "") or "").strip()
-    return rsn.upper() if rsn else ""
-
-def equity_row_before(eq: pd.DataFrame, ts: pd.Timestamp) -> dict:
+def _ts_ns(s: pd.Series) -> np.ndarray:
+    """UTC timestamps as raw int64 ns (NaT -> int64 min): no tz handling in searchsorted/compares."""
+    return np.asarray(s.values, dtype="datetime64[ns]").view("i8")
+
+@dataclass
+class EquityIdx:
+    """Sorted equity timestamps (int64 ns) and balance columns as plain arrays, for point lookups."""
+    ts_i64: np.ndarray
+    cash: np.ndarray
+    btc: np.ndarray
+    price: np.ndarray
+
+    @classmethod
+    def from_frame(cls, eq: pd.DataFrame) -> "EquityIdx":
+        def col(c):
+            if c not in eq.columns:
+                return np.zeros(len(eq))
+            return pd.to_numeric(eq[c], errors="coerce").to_numpy(dtype=float)
+        return cls(_ts_ns(eq["ts"]), col("cash_usd"), col("btc"), col("price"))
+
+def equity_row_before(idx: EquityIdx, ts: pd.Timestamp) -> dict:
     """Return the most recent equity row <= ts (as dict)."""
-    i = int(eq["ts"].searchsorted(ts, side="right")) - 1
-    i = max(0, min(i, len(eq)-1))
-    return {
-        "cash_usd": _as_float(eq["cash_usd"].iloc[i]) if "cash_usd" in eq.columns else 0.0,
-        "btc":      _as_float(eq["btc"].iloc[i])      if "btc"      in eq.columns else 0.0,
-        "price":    _as_float(eq["price"].iloc[i])    if "price"    in eq.columns else 0.0,
-    }
-
-def _qty_btc(row) -> float:
-    """Prefer qty_btc if present; else qty; handle blanks."""
-    try:
-        return float(row.get("qty", row.get("qty_btc", 0) or 0) or 0.0)
-    except Exception:
-        return 0.0
+    i = int(np.searchsorted(idx.ts_i64, pd.Timestamp(ts).value, side="right")) - 1
+    i = max(0, min(i, len(idx.ts_i64)-1))
+    return {"cash_usd": float(idx.cash[i]), "btc": float(idx.btc[i]), "price": float(idx.price[i])}
 
 def _src(row) -> str:
     return str(row.get("source") or row.get("reason") or "").upper()
@@ -68,32 +107,42 @@ def _note(row) -> str:
     # prefer explicit note; else show reason (LLM rationale etc.)
     return str(row.get("note") or row.get("reason") or "")
 
-def _is_na(v) -> bool:
-    try:
-        return pd.isna(v) or str(v).strip().lower() in {"nan", "none", ""}
-    except Exception:
-        return False
+def _to_ts_any(col: pd.Series) -> pd.Series:
+    """Epoch ms (> 1e12), epoch s (> 1e9) or ISO strings -> UTC timestamps, vectorized."""
+    raw = col.astype(str).str.strip()
+    v = pd.to_numeric(raw, errors="coerce")
+    out = pd.Series(pd.NaT, index=col.index, dtype="datetime64[ns, UTC]")
+    ms, sec = v > 1e12, (v > 1e9) & (v <= 1e12)
+    if ms.any():
+        out[ms] = pd.to_datetime(np.trunc(v[ms]).astype("int64"), unit="ms", utc=True, errors="coerce")
+    if sec.any():
+        out[sec] = pd.to_datetime(np.trunc(v[sec]).astype("int64"), unit="s", utc=True, errors="coerce")
+    rest = ~(ms | sec) & (raw != "")
+    if rest.any():
+        out[rest] = pd.to_datetime(raw[rest], utc=True, errors="coerce", format="mixed")
+    return out
 
-def _to_float_or_none(v):
-    try:
-        x = float(v)
-        return None if not np.isfinite(x) else x
-    except Exception:
-        return None
+def _num_col(df: pd.DataFrame, col: str) -> np.ndarray:
+    """Column as float64, NaN where missing/unparseable (all NaN if the column is absent)."""
+    if col not in df.columns:
+        return np.full(len(df), np.nan)
+    return pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
 
-def _fmt_money(v: object) -> str:
-    x = _to_float_or_none(v)
-    return "" if x is None else f"${x:,.2f}"
+def _fmt_col(x: np.ndarray, spec: str) -> list:
+    # one isfinite over the column; blank for NaN/inf instead of a try/except per cell
+    return [spec.format(v) if ok else "" for v, ok in zip(x.tolist(), np.isfinite(x).tolist())]
 
-def _fmt_btc(v: object) -> str:
-    x = _to_float_or_none(v)
-    return "" if x is None else f"{x:.8f}"
+def _fmt_money_col(x: np.ndarray) -> list:
+    return _fmt_col(x, "${:,.2f}")   # fees are money too
 
-def _fmt_fee(v: object) -> str:
-    # fee is money; blank if missing
-    return _fmt_money(v)
+def _fmt_btc_col(x: np.ndarray) -> list:
+    return _fmt_col(x, "{:.8f}")
 
-def enrich_trades_with_balances(trades: pd.DataFrame, eq: pd.DataFrame) -> pd.DataFrame:
+def _qty_col(df: pd.DataFrame) -> np.ndarray:
+    # qty_btc when the column exists, else qty
+    return _num_col(df, "qty_btc" if "qty_btc" in df.columns else "qty")
+
+def enrich_trades_with_balances(trades: pd.DataFrame, eq_idx: EquityIdx) -> pd.DataFrame:
     """
     Replays trades forward, computing notional, cash_after, btc_after, equity_after.
     Uses the equity snapshot just before the first trade as the starting point.
@@ -101,78 +150,177 @@ def enrich_trades_with_balances(trades: pd.DataFrame, eq: pd.DataFrame) -> pd.Da
     if trades is None or trades.empty:
         return trades
 
-    t = trades.copy()
-
-    # --- ensure clean, numeric inputs
-    t["ts"]   = pd.to_datetime(t["ts"], utc=True, errors="coerce")
-    t["side"] = t.get("side","").astype(str).str.lower().str.strip()
+    # NaT rows dropped and sorted by ts (same quicksort order as sort_values)
+    ts = _utc_if_parsed(trades["ts"])
+    if ts is None:
+        ts = pd.to_datetime(trades["ts"], utc=True, errors="coerce")
+    pos = np.flatnonzero(ts.notna().to_numpy())
+    order = pos[np.argsort(_ts_ns(ts)[pos], kind="quicksort")]
+    n = len(order)
+
+    # --- replay inputs as plain arrays; only the text/meta columns go through one frame gather
+    cols = list(trades.columns)
+    side = trades["side"].take(order) if "side" in cols else pd.Series("", index=range(n))
+    fresh = {"ts": ts.array.take(order),
+             "side": side.astype(str).str.lower().str.strip().astype("category").array}
     # prefer qty then qty_btc, but keep both as numeric for safety
-    if "qty" in t.columns:
-        t["qty"] = pd.to_numeric(t["qty"], errors="coerce")
-    if "qty_btc" in t.columns:
-        t["qty_btc"] = pd.to_numeric(t["qty_btc"], errors="coerce")
-    t["price"]   = pd.to_numeric(t.get("price", 0),    errors="coerce")
-    t["fee_usd"] = pd.to_numeric(t.get("fee_usd", 0),  errors="coerce")
-
-    # canonical qty accessor
-    def _q(row):
-        q = row["qty"] if "qty" in row and pd.notna(row["qty"]) else row.get("qty_btc", 0)
-        return float(q) if pd.notna(q) else 0.0
-
-    t = t.dropna(subset=["ts"]).sort_values("ts").reset_index(drop=True)
+    for c in ("qty", "qty_btc", "price", "fee_usd"):
+        if c in cols:
+            fresh[c] = pd.to_numeric(trades[c].to_numpy()[order], errors="coerce")
+
+    t = trades.iloc[order, [i for i, c in enumerate(cols) if c not in fresh]]
+    t.index = pd.RangeIndex(n)
+    for loc, c in enumerate(cols):   # back into their original column positions
+        if c in fresh:
+            t.insert(loc, c, fresh[c])
+    for c in ("price", "fee_usd"):
+        if c not in cols:
+            t[c] = 0
 
     # starting balances from the equity history right before the first trade
-    start_bal = equity_row_before(eq, t["ts"].iloc[0])
-    cash = float(start_bal.get("cash_usd", 0) or 0.0)
-    btc  = float(start_bal.get("btc", 0) or 0.0)
-
-    out_rows = []
-    for _, r in t.iterrows():
-        side = r["side"]
-        px   = float(r["price"]  if pd.notna(r["price"])   else 0.0)
-        qty  = _q(r)
-        fee  = float(r["fee_usd"] if pd.notna(r["fee_usd"]) else 0.0)
-        notional = px * qty
-
-        if side == "buy":
-            cash -= (notional + fee)
-            btc  += qty
-        elif side == "sell":
-            btc  -= qty
-            cash += (notional - fee)
-
-        equity_after = cash + btc * px
-
-        o = dict(r)
-        o["qty_btc"]      = qty
-        o["notional"]     = notional
-        o["cash_after"]   = cash
-        o["btc_after"]    = btc
-        o["equity_after"] = equity_after
-        o["ts_dt"]        = pd.to_datetime(r["ts"]).strftime("%Y-%m-%d %H:%M")
-        out_rows.append(o)
-
-    return pd.DataFrame(out_rows)
+    start_bal = equity_row_before(eq_idx, fresh["ts"][0])
+    cash0 = float(start_bal.get("cash_usd", 0) or 0.0)
+    btc0  = float(start_bal.get("btc", 0) or 0.0)
+
+    # canonical qty: qty, else qty_btc, else 0
+    qty = np.asarray(fresh["qty"], dtype=float) if "qty" in fresh else np.full(n, np.nan)
+    if "qty_btc" in fresh:
+        qty = np.where(np.isnan(qty), np.asarray(fresh["qty_btc"], dtype=float), qty)
+    qty = np.where(np.isnan(qty), 0.0, qty)
+    px  = t["price"].to_numpy(dtype=float)
+    px  = np.where(np.isnan(px), 0.0, px)
+    fee = t["fee_usd"].to_numpy(dtype=float)
+    fee = np.where(np.isnan(fee), 0.0, fee)
+    notional = px * qty
+
+    # +1 buy, -1 sell, 0 for any other side (no-op)
+    buy, sell = fresh["side"] == "buy", fresh["side"] == "sell"
+    sign = np.where(buy, 1, np.where(sell, -1, 0)).astype(np.int8)
+    cash, btc = run_balances(sign, px, qty, fee, cash0, btc0)
+
+    t["qty_btc"]      = qty
+    t["notional"]     = notional
+    t["cash_after"]   = cash
+    t["btc_after"]    = btc
+    t["equity_after"] = cash + btc * px
+    t["ts_dt"]        = fresh["ts"].strftime("%Y-%m-%d %H:%M")
+    return t
 
 # ---------- load ----------
-def load_equity() -> pd.DataFrame:
-    if not Path(EQ_CSV).exists():
-        raise SystemExit(f"[overlay] missing {EQ_CSV}")
-    df = pd.read_csv(EQ_CSV)
+EQ_DTYPES = {c: "float64" for c in ("price","cash_usd","btc","equity")}
+
+EQ_CACHE  = cache_path(EQ_CSV, "overlay")   # parsed equity + the CSV byte count (and fingerprint) it covers
+EQ_NAMES  = ["ts","price","cash_usd","btc","equity","agent_flag"]  # headerless layout
+EQ_PRINT  = 4096   # bytes just before the cached offset that fingerprint the prefix the cache covers
+
+def _read_equity_csv(src=EQ_CSV, **kw) -> pd.DataFrame:
+    # pyarrow's multithreaded reader when installed (it is optional), else the mmapped C engine
+    try:
+        return pd.read_csv(src, engine="pyarrow", dtype=EQ_DTYPES, **kw)
+    except (ImportError, ValueError):
+        if hasattr(src, "seek"):
+            src.seek(0)
+        return pd.read_csv(src, memory_map=True, **kw)
+
+def _parse_equity(src) -> pd.DataFrame:
+    df = _read_equity_csv(src)
     ts_col = next((c for c in ("ts_utc","ts","ts_dt") if c in df.columns), None)
     if ts_col is None:  # headerless
-        df = pd.read_csv(EQ_CSV, header=None,
-                         names=["ts","price","cash_usd","btc","equity","agent_flag"])
+        if hasattr(src, "seek"):
+            src.seek(0)
+        df = _read_equity_csv(src, header=None, names=EQ_NAMES)
         ts_col = "ts"
-    df["ts"]      = ensure_utc(df[ts_col])
+    df["ts"]      = ensure_utc(df[ts_col]).astype("datetime64[ns, UTC]")  # int64-ns view is searched later
     df["price"]   = pd.to_numeric(df.get("price", np.nan), errors="coerce")
     df["btc"]     = pd.to_numeric(df.get("btc",   np.nan), errors="coerce")
     df["equity"]  = pd.to_numeric(df.get("equity",np.nan), errors="coerce")
-    df = (df.dropna(subset=["ts"]).sort_values("ts")
-            .drop_duplicates(subset=["ts"], keep="last")
-            .reset_index(drop=True))
+    return _tidy_equity(df)
+
+def _tidy_equity(df: pd.DataFrame) -> pd.DataFrame:
+    """Drop NaT, sort by ts and keep the last row per ts -- one argsort and one fancy index."""
+    t = df["ts"].values.view("i8")
+    valid = np.flatnonzero(t != np.iinfo(np.int64).min)   # NaT
+    order = valid[np.argsort(t[valid], kind="stable")]
+    ts_sorted = t[order]
+    keep = np.ones(len(order), dtype=bool)
+    keep[:-1] = ts_sorted[1:] != ts_sorted[:-1]            # last of each equal-ts run
+    out = df.iloc[order[keep]]
+    out.index = pd.RangeIndex(len(out))   # reset_index(drop=True) would copy every column again
+    return out
+
+def _equity_print(f, offset: int) -> str:
+    """sha1 of the EQ_PRINT bytes before `offset` in the open CSV `f`."""
+    start = max(0, offset - EQ_PRINT)
+    f.seek(start)
+    return hashlib.sha1(f.read(offset - start)).hexdigest()
+
+def _parse_equity_appended(offset: int, fingerprint: str):
+    """Parse only the rows appended after byte `offset` (the log is append-only); None if unusable."""
+    with open(EQ_CSV, "rb") as f:
+        header = f.readline()
+        if offset < f.tell():
+            return None
+        f.seek(offset - 1)
+        if f.read(1) != b"\n":   # cache was taken mid-line
+            return None
+        if _equity_print(f, offset) != fingerprint:   # rewritten rather than appended to
+            return None
+        tail = f.read()
+    headered = any(k in header.decode("utf-8-sig", "ignore").strip().lower().split(",")
+                   for k in ("ts_utc","ts","ts_dt"))
+    return _parse_equity(io.BytesIO((header if headered else b"") + tail))
+
+def load_equity() -> pd.DataFrame:
+    if not Path(EQ_CSV).exists():
+        raise SystemExit(f"[overlay] missing {EQ_CSV}")
+    size = os.path.getsize(EQ_CSV)
+    cached = None
+    if Path(EQ_CACHE).exists():
+        try:
+            cached = pd.read_parquet(EQ_CACHE)
+        except Exception:
+            pass  # no parquet engine / unreadable cache -> parse the CSV
+    done = cached.attrs.get("csv_bytes", 0) if cached is not None else 0
+    if cached is not None and done == size and os.path.getmtime(EQ_CACHE) >= os.path.getmtime(EQ_CSV):
+        return cached
+
+    new = (_parse_equity_appended(done, cached.attrs.get("csv_print", ""))
+           if cached is not None and 0 < done < size else None)
+    df = _parse_equity(EQ_CSV) if new is None else _tidy_equity(pd.concat([cached, new], ignore_index=True))
+    df.attrs["csv_bytes"] = size
+    with open(EQ_CSV, "rb") as f:
+        df.attrs["csv_print"] = _equity_print(f, size)
+    try:
+        df.to_parquet(EQ_CACHE, index=False)
+    except Exception:
+        pass  # cache is best-effort
     return df
 
+def _read_trades_csv(path) -> pd.DataFrame:
+    """Headered trades log as all-text columns, NaN for blanks; pyarrow when installed, else the mmapped C engine."""
+    if pa is not None:
+        with open(path, "r", encoding="utf-8-sig", errors="ignore", newline="") as f:
+            names = next(csv.reader(f), [])
+        try:
+            # pandas' NA tokens, not pyarrow's default set (which lacks "None" and "<NA>")
+            df = pa_csv.read_csv(path, convert_options=pa_csv.ConvertOptions(
+                column_types={c: pa.string() for c in names}, strings_can_be_null=True,
+                null_values=sorted(STR_NA_VALUES))).to_pandas()
+            return none_to_nan(df)
+        except (pa.ArrowInvalid, ValueError):
+            pass  # ragged or odd file -> let pandas have a go
+    return pd.read_csv(path, dtype=str, memory_map=True)
+
+def _read_legacy_columns(path) -> list:
+    """Headerless legacy log -> one str Series per field position (NaN for blanks); [] if empty."""
+    # read_csv's C tokenizer: ~3x faster here than csv.reader plus a per-cell Python transpose
+    with open(path, "r", encoding="utf-8", errors="ignore") as fh:
+        try:
+            df = pd.read_csv(fh, header=None, dtype=str)
+        except pd.errors.EmptyDataError:
+            return []
+    return [df[c] for c in df.columns]
+
 def parse_all_trades_utc() -> pd.DataFrame:
     """
     Load ALL trades and produce a UTC-aware 'ts' column.
@@ -185,20 +333,6 @@ def parse_all_trades_utc() -> pd.DataFrame:
     if not path.exists():
         return pd.DataFrame(columns=["ts","side","price","qty","reason","source","confidence","fee_usd","note"])
 
-    def to_ts_any(x):
-        s = str(x).strip()
-        if not s:
-            return pd.NaT
-        try:
-            v = float(s)
-            if v > 1e12:  # epoch ms
-                return pd.to_datetime(int(v), unit="ms", utc=True, errors="coerce")
-            if v > 1e9:   # epoch s
-                return pd.to_datetime(int(v), unit="s", utc=True, errors="coerce")
-        except Exception:
-            pass
-        return pd.to_datetime(s, utc=True, errors="coerce")
-
     # --- sniff header safely (without using pandas kwargs that vary by version) ---
     try:
         with open(path, "r", encoding="utf-8", errors="ignore") as f:
@@ -209,19 +343,15 @@ def parse_all_trades_utc() -> pd.DataFrame:
 
     if headered:
         # read normally
-        df = pd.read_csv(path, dtype=str)  # no 'errors' kw
+        df = _read_trades_csv(path)
         cols = {c.strip().lower(): c for c in df.columns}
 
         # timestamps
         if "ts_utc" in cols:
             ts = pd.to_datetime(df[cols["ts_utc"]], utc=True, errors="coerce")
         elif "ts" in cols:
-            raw = df[cols["ts"]].astype(str).str.strip()
-            num = pd.to_numeric(raw, errors="coerce")
-            ts  = pd.to_datetime(num, unit="s", utc=True, errors="coerce")
-            bad = ts.isna()
-            if bad.any():
-                ts.loc[bad] = pd.to_datetime(raw[bad], utc=True, errors="coerce")
+            # same ms / s / ISO split as the legacy branch (epoch ms used to overflow unit="s")
+            ts = _to_ts_any(df[cols["ts"]])
         else:
             ts = pd.NaT
 
@@ -245,139 +375,281 @@ def parse_all_trades_utc() -> pd.DataFrame:
         out["fee_usd"]    = pd.to_numeric(df[cols["fee_usd"]],    errors="coerce") if "fee_usd"    in cols else np.nan
         out["note"]       = df[cols["note"]] if "note" in cols else ""
     else:
-        # headerless legacy — open with errors='ignore' and pass the handle to pandas
-        with open(path, "r", encoding="utf-8", errors="ignore") as fh:
-            df = pd.read_csv(fh, header=None, dtype=str)
-
-        n = df.shape[1]
+        # headerless legacy — open with errors='ignore', one column per field position
+        col = _read_legacy_columns(path)
+        n = len(col)
+        if n == 0:
+            return pd.DataFrame(columns=["ts","side","price","qty","reason","source","confidence","fee_usd","note"])
         out = pd.DataFrame()
-        out["ts"]   = df.iloc[:, 0].map(to_ts_any)
-        out["side"] = df.iloc[:, 1].astype(str).str.lower().str.strip() if n >= 2 else ""
+        out["ts"]   = _to_ts_any(col[0])
+        out["side"] = col[1].astype(str).str.lower().str.strip() if n >= 2 else ""
 
         # assume: id,side,reason,price,qty,fee,note,(confidence?),...
-        out["reason"]  = df.iloc[:, 2] if n >= 3 else ""
+        out["reason"]  = col[2] if n >= 3 else ""
         out["source"]  = out["reason"]
-        out["price"]   = pd.to_numeric(df.iloc[:, 3], errors="coerce") if n >= 4 else np.nan
-        out["qty"]     = pd.to_numeric(df.iloc[:, 4], errors="coerce") if n >= 5 else np.nan
-        out["fee_usd"] = pd.to_numeric(df.iloc[:, 5], errors="coerce") if n >= 6 else np.nan
-        out["note"]    = df.iloc[:, 6] if n >= 7 else ""
-        out["confidence"] = pd.to_numeric(df.iloc[:, 7], errors="coerce") if n >= 8 else np.nan
+        out["price"]   = pd.to_numeric(col[3], errors="coerce") if n >= 4 else np.nan
+        out["qty"]     = pd.to_numeric(col[4], errors="coerce") if n >= 5 else np.nan
+        out["fee_usd"] = pd.to_numeric(col[5], errors="coerce") if n >= 6 else np.nan
+        out["note"]    = col[6] if n >= 7 else ""
+        out["confidence"] = pd.to_numeric(col[7], errors="coerce") if n >= 8 else np.nan
+
+    # low-cardinality text -> category: the buy/sell filters compare int codes, not strings
+    for c in ("side", "source", "reason"):
+        out[c] = out[c].astype("category")
 
     out = out.dropna(subset=["ts"]).sort_values("ts").reset_index(drop=True)
     print(f"[overlay] trades parsed: {len(out)} | utc range: {out['ts'].min() if len(out) else '—'} -> {out['ts'].max() if len(out) else '—'}")
     return out
 
 
+def _balance_key(eq_idx: EquityIdx, trades: pd.DataFrame) -> str:
+    # enrichment only reads the equity row just before the first trade, so key on that row
+    # rather than on equity_history.csv, which grows every tick
+    if trades.empty:
+        return "-"
+    return repr(tuple(equity_row_before(eq_idx, trades["ts"].iloc[0]).values()))
+
+def load_trades(eq_full: pd.DataFrame) -> pd.DataFrame:
+    """parse_all_trades_utc + enrich_trades_with_balances, memoized in .trades.overlay.parquet."""
+    eq_idx = EquityIdx.from_frame(eq_full)   # shared by the cache key and the replay
+    fresh = []
+    def parse(_path):
+        fresh.append(True)
+        return enrich_trades_with_balances(parse_all_trades_utc(), eq_idx)
+    if not Path(TRADES_CSV).exists():
+        return parse(TRADES_CSV)
+    trades = cached_read(TRADES_CSV, "overlay", parse, extra=lambda df: _balance_key(eq_idx, df))
+    if not fresh:
+        print(f"[overlay] trades parsed: {len(trades)} (cached)")
+    return trades
+
+
 # ---------- benchmarks ----------
+def _dca_scan_loop(t, p, week_ns):
+    # buy $1 on the first row, then on the first row >= 7 days after the previous buy;
+    # the curve is linear in the lot, so callers scale it (one scan serves any DCA amount)
+    n = t.shape[0]
+    out = np.empty(n)
+    btc = 0.0
+    last = 0
+    for i in range(n):
+        if i == 0 or t[i] - last >= week_ns:
+            if np.isfinite(p[i]) and p[i] > 0:
+                btc += 1.0 / p[i]
+            last = t[i]
+        out[i] = btc * p[i] if np.isfinite(p[i]) else np.nan
+    return out
+
+def _dca_buy_rows(t, week_ns):
+    """Rows the DCA buys on, without a per-week loop.
+
+    Lay a fixed weekly grid from the last buy and find every grid point with one searchsorted.
+    While each point hits a row exactly, the grid is the buy schedule; at the first point that
+    lands on a later row the chain drifts, so restart the grid from that row.
+    """
+    n, start, parts = len(t), 0, []
+    while start < n:
+        grid = t[start] + np.arange((t[-1] - t[start]) // week_ns + 1) * week_ns
+        idx = np.searchsorted(t, grid, side="left")
+        miss = np.flatnonzero(t[idx] != grid)
+        if miss.size == 0:
+            parts.append(idx)
+            break
+        parts.append(idx[:miss[0]])
+        start = idx[miss[0]]
+    return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+def _dca_scan_np(t, p, week_ns):
+    buy_idx = _dca_buy_rows(t, week_ns)
+    buy_idx = buy_idx[np.isfinite(p[buy_idx]) & (p[buy_idx] > 0)]
+    incr = np.zeros(len(p))
+    incr[buy_idx] = 1.0 / p[buy_idx]
+    return np.cumsum(incr) * np.where(np.isfinite(p), p, np.nan)
+
+# numba is optional (not in requirements.txt): JIT the sequential scan when present,
+# otherwise the searchsorted + cumsum version gives the same values
+_dca_scan = njit(cache=True)(_dca_scan_loop) if njit else _dca_scan_np
+
 def build_benchmarks(eq: pd.DataFrame) -> Tuple[pd.Series, pd.Series]:
     if eq.empty:
         return pd.Series(dtype=float), pd.Series(dtype=float)
-    e0, p0 = float(eq["equity"].iloc[0]), float(eq["price"].iloc[0])
+    price = eq["price"].to_numpy(dtype=np.float64)   # shared by both benchmarks
+    e0, p0 = float(eq["equity"].iat[0]), float(price[0])
     qty = (e0 / p0) if np.isfinite(p0) and p0 > 0 else 0.0
-    hold = (qty * eq["price"]).rename("hold_equity")
-
-    dca_btc, last, vals = 0.0, None, []
-    for ts, price in zip(eq["ts"], eq["price"]):
-        if (last is None) or (ts - last >= pd.Timedelta(days=7)):
-            if np.isfinite(price) and price > 0:
-                dca_btc += DCA_LOT / float(price)
-            last = ts
-        vals.append(dca_btc * float(price if np.isfinite(price) else np.nan))
-    dca = pd.Series(vals, index=eq.index, name="dca_equity")
+    # the benchmark curves are only plotted, so they are kept as float32; BTC amounts stay float64
+    hold = pd.Series((qty * price).astype(np.float32), index=eq.index, name="hold_equity")
+    dca_vals = DCA_LOT * _dca_scan(_ts_ns(eq["ts"]), price, WEEK_NS)
+    dca = pd.Series(dca_vals.astype(np.float32), index=eq.index, name="dca_equity")
     return hold, dca
 
+# ---------- windows ----------
+def _two_windows_loop(t, s1, e1, s2, e2):
+    # both [s, e] masks in one sweep over the timestamps
+    n = t.shape[0]
+    m1 = np.empty(n, dtype=np.bool_)
+    m2 = np.empty(n, dtype=np.bool_)
+    for i in range(n):
+        v = t[i]
+        m1[i] = s1 <= v and v <= e1
+        m2[i] = s2 <= v and v <= e2
+    return m1, m2
+
+def _two_windows_np(t, s1, e1, s2, e2):
+    return (t >= s1) & (t <= e1), (t >= s2) & (t <= e2)
+
+_two_windows = njit(cache=True)(_two_windows_loop) if njit else _two_windows_np
+
 # ---------- plot ----------
+PNG_DPI = 150
+
+def _buckets(x: np.ndarray, y: np.ndarray, n: int):
+    """M4-style reduction: per equal-count bucket -> (first x, mean, min, max), NaN-aware."""
+    starts = np.unique(np.linspace(0, len(y), n + 1).astype(int)[:-1])
+    ok = np.isfinite(y)
+    cnt = np.add.reduceat(ok.astype(np.int64), starts)
+    mean = np.add.reduceat(np.where(ok, y, 0), starts) / np.where(cnt > 0, cnt, np.nan)
+    return x[starts], mean, np.fmin.reduceat(y, starts), np.fmax.reduceat(y, starts)
+
+_FIG = None   # (fig, ax) kept across renders in daemon mode
+
+def _figure():
+    """New figure for one-shot runs; in daemon mode build it once and clear the axes between renders."""
+    global _FIG
+    if DAEMON_SECS <= 0:
+        return plt.subplots(figsize=(16, 6))
+    if _FIG is None:
+        _FIG = plt.subplots(figsize=(16, 6))
+    else:
+        fig, ax = _FIG
+        ax.clear()
+        # back to the rc margins so tight_layout starts from the same point as a fresh figure
+        fig.subplots_adjust(**{k: plt.rcParams[f"figure.subplot.{k}"]
+                               for k in ("left", "right", "bottom", "top")})
+    return _FIG
+
 def plot(eq, trades, hold, dca, out_png):
-    fig, ax = plt.subplots(figsize=(16, 6))
-    ax.plot(eq["ts"], eq["equity"], label="Hybrid (Your Agent)", zorder=3)
-    ax.plot(eq["ts"], hold,        label="Buy & Hold",          zorder=2)
-    ax.plot(eq["ts"], dca,         label=f"Weekly DCA (${int(DCA_LOT)})", zorder=1)
+    fig, ax = _figure()
+    x = eq["ts"].values
+    width_px = int(fig.get_size_inches()[0] * PNG_DPI)
+    for y, label, z in ((eq["equity"].to_numpy(dtype=np.float32), "Hybrid (Your Agent)", 3),
+                        (np.asarray(hold), "Buy & Hold", 2),
+                        (np.asarray(dca), f"Weekly DCA (${int(DCA_LOT)})", 1)):
+        if len(y) > 4 * width_px:
+            # one mean point per pixel column, min/max band keeps the spikes visible
+            xb, mean, lo, hi = _buckets(x, y, width_px)
+            line, = ax.plot(xb, mean, label=label, zorder=z, rasterized=True)
+            ax.fill_between(xb, lo, hi, color=line.get_color(), alpha=0.2, linewidth=0, zorder=z,
+                            rasterized=True)
+        else:
+            ax.plot(x, y, label=label, zorder=z, rasterized=True)
 
     if not trades.empty:
         rng = float(eq["equity"].max() - eq["equity"].min() or 1.0)
-        def scatter(side, marker, color, off):
-            df = trades[trades["side"]==side]
-            if df.empty: return
-            xs, ys = [], []
-            for _, r in df.iterrows():
-                xs.append(r["ts"])
-                ys.append(equity_at(r["ts"], eq) + off*0.01*rng)
-            ax.scatter(xs, ys, marker=marker, s=220, zorder=7,
-                       facecolor=color, edgecolor="black", linewidth=0.8,
-                       label=side.capitalize())
-        scatter("buy",  "^", "#1f77b4", +1)
-        scatter("sell", "v", "#d62728", -1)
+        eq_ts = _ts_ns(eq["ts"])
+        # equity at or before every trade in one searchsorted; trades before the first
+        # equity row take the first value
+        idx = np.clip(eq_ts.searchsorted(_ts_ns(trades["ts"]), side="right") - 1, 0, len(eq_ts)-1)
+        xs, ys = trades["ts"].values, eq["equity"].to_numpy()[idx]
+        side = trades["side"].to_numpy()
+        for name, marker, color, off in (("buy", "^", "#1f77b4", +1), ("sell", "v", "#d62728", -1)):
+            m = side == name
+            if not m.any():
+                continue
+            # marker-only Line2D: one shared marker path instead of a per-point PathCollection;
+            # rasterized like the curves for any vector-format save
+            ax.plot(xs[m], ys[m] + off*0.01*rng, linestyle="None",
+                    marker=marker, markersize=np.sqrt(220), zorder=7,
+                    markerfacecolor=color, markeredgecolor="black", markeredgewidth=0.8,
+                    label=name.capitalize(), rasterized=True)
 
     ax.set_title("Equity Curve — Hybrid vs Hold vs DCA (with trade markers)")
     ax.set_xlabel("Date"); ax.set_ylabel("Equity (USD)")
     h,l = ax.get_legend_handles_labels(); ax.legend(dict(zip(l,h)).values(), dict(zip(l,h)).keys())
-    fig.autofmt_xdate(); fig.tight_layout(); fig.savefig(out_png, dpi=150); plt.close(fig)
+    fig.autofmt_xdate(); fig.tight_layout()
+    # fast zlib level: the overlay is re-rendered often, a somewhat larger file is fine
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=PNG_DPI, pil_kwargs={"compress_level": 1, "optimize": False})
+    if DAEMON_SECS <= 0:
+        plt.close("all")   # nothing else should be open; drop anything that is
+    _write_atomic(out_png, buf.getvalue())
     print(f"[overlay] wrote PNG: {out_png}")
 
 # ---------- html ----------
+# trade table header shared by the overlay page and the weekly report
+TRADE_HEADER_EXT = (
+    "<tr><th>Time (UTC)</th><th>Side</th><th>Source</th>"
+    "<th>Price</th><th>Qty (BTC)</th><th>Fee</th><th>Note</th>"
+    "<th>Cash &rarr;</th><th>BTC &rarr;</th><th>Equity &rarr;</th><th>Notional</th></tr>"
+)
+
+def _write_atomic(path: str, data) -> None:
+    """Write bytes, a str, or a list of str chunks (UTF-8) to a temp file and rename over path,
+    so readers never see a partial file."""
+    tmp = path + ".tmp"
+    if isinstance(data, list):
+        # chunks stream through one large buffer; no joined copy of the whole page
+        with open(tmp, "w", encoding="utf-8", newline="", buffering=1 << 20) as f:
+            f.writelines(data)
+    else:
+        with open(tmp, "wb") as f:
+            f.write(data.encode("utf-8") if isinstance(data, str) else data)
+    os.replace(tmp, path)
+
+def _trade_rows_ext(df: pd.DataFrame, note_max: Optional[int] = None) -> list:
+    """<tr> rows matching TRADE_HEADER_EXT; numbers are formatted per column, text comes from plain dicts."""
+    cols = zip(
+        df["ts"].dt.strftime("%Y-%m-%d %H:%M"), df.to_dict("records"),
+        _fmt_money_col(_num_col(df, "price")), _fmt_btc_col(_qty_col(df)),
+        _fmt_money_col(_num_col(df, "fee_usd")), _fmt_money_col(_num_col(df, "cash_after")),
+        _fmt_btc_col(_num_col(df, "btc_after")), _fmt_money_col(_num_col(df, "equity_after")),
+        _fmt_money_col(_num_col(df, "notional")),
+    )
+    return [
+        f"<tr><td>{ts}</td><td>{r.get('side','')}</td><td>{_src(r)}</td>"
+        f"<td>{px}</td><td>{qty}</td><td>{fee}</td><td>{_note(r)[:note_max]}</td>"
+        f"<td>{cash}</td><td>{btc}</td><td>{eq}</td><td>{notional}</td></tr>"
+        for ts, r, px, qty, fee, cash, btc, eq, notional in cols
+    ]
+
 def write_html(out_png: str, eq: pd.DataFrame, trades_window: pd.DataFrame, all_trades: pd.DataFrame):
     out_html = os.path.join(STATE_DIR, "baseline_summary_with_trades.html")
     latest = eq.iloc[-1]
 
     # ---- Trades inside the overlay window (use trades_window) ----
-    rows = ""
+    rows = []
     if not trades_window.empty:
         tshow = trades_window.sort_values("ts", ascending=False).head(25)
-        for _, r in tshow.iterrows():
-            rows += (
-                f"<tr><td>{pd.to_datetime(r['ts']).strftime('%Y-%m-%d %H:%M')}</td>"
-                f"<td>{r.get('side','')}</td><td>{_src(r)}</td>"
-                f"<td>{_fmt_money(r.get('price'))}</td>"
-                f"<td>{_fmt_btc(r.get('qty_btc', r.get('qty')))}</td>"
-                f"<td>{_fmt_fee(r.get('fee_usd'))}</td>"
-                f"<td>{_note(r)}</td>"
-                f"<td>{_fmt_money(r.get('cash_after'))}</td>"
-                f"<td>{_fmt_btc(r.get('btc_after'))}</td>"
-                f"<td>{_fmt_money(r.get('equity_after'))}</td>"
-                f"<td>{_fmt_money(r.get('notional'))}</td></tr>"
-            )
-
-    header_win_ext = (
-        "<tr><th>Time (UTC)</th><th>Side</th><th>Source</th>"
-        "<th>Price</th><th>Qty (BTC)</th><th>Fee</th><th>Note</th>"
-        "<th>Cash &rarr;</th><th>BTC &rarr;</th><th>Equity &rarr;</th><th>Notional</th></tr>"
-    )
-    table = ("<table border='1' cellspacing='0' cellpadding='4'>"
-             f"{header_win_ext}{rows}</table>") if rows else "<p>No trades in overlay window.</p>"
+        rows = _trade_rows_ext(tshow)
+    table = (["<table border='1' cellspacing='0' cellpadding='4'>", TRADE_HEADER_EXT, *rows, "</table>"]
+             if rows else ["<p>No trades in overlay window.</p>"])
 
     # ---- Recent 48h across ALL trades (use all_trades; do NOT reparse) ----
-    recent_html = "<p>No trades in last 48 hours.</p>"
+    recent = ["<p>No trades in last 48 hours.</p>"]
     try:
         if all_trades is not None and not all_trades.empty:
-            rec_df = all_trades.copy()
-            rec_df["ts"] = pd.to_datetime(rec_df["ts"], utc=True, errors="coerce")
-            rec_df = rec_df.dropna(subset=["ts"])
-
-            latest_ts = rec_df["ts"].max()
-            cutoff = latest_ts - pd.Timedelta(hours=48)
+            tr_i8 = _ts_ns(all_trades["ts"])
+            latest_i8 = tr_i8[tr_i8 != np.iinfo(np.int64).min].max()   # skip NaT
+            cutoff = latest_i8 - 48 * 3600 * 1_000_000_000
 
-            rec = rec_df[rec_df["ts"] >= cutoff].sort_values("ts", ascending=False).head(25)
+            rec = all_trades[tr_i8 >= cutoff].sort_values("ts", ascending=False).head(25)
             if not rec.empty:
-                rows2 = []
-                for _, r in rec.iterrows():
-                    rows2.append(
-                        f"<tr><td>{pd.to_datetime(r['ts']).strftime('%Y-%m-%d %H:%M')}</td>"
-                        f"<td>{r.get('side','')}</td><td>{str(r.get('source','')).upper()}</td>"
-                        f"<td>{_fmt_money(r.get('price'))}</td>"
-                        f"<td>{_fmt_btc(r.get('qty_btc', r.get('qty')))}</td>"
-                        f"<td>{_fmt_fee(r.get('fee_usd'))}</td>"
-                        f"<td>{_note(r)[:60]}</td></tr>"
-                    )
+                cols = zip(rec["ts"].dt.strftime("%Y-%m-%d %H:%M"), rec.to_dict("records"),
+                           _fmt_money_col(_num_col(rec, "price")), _fmt_btc_col(_qty_col(rec)),
+                           _fmt_money_col(_num_col(rec, "fee_usd")))
+                rows2 = [
+                    f"<tr><td>{ts}</td><td>{r.get('side','')}</td><td>{str(r.get('source','')).upper()}</td>"
+                    f"<td>{px}</td><td>{qty}</td><td>{fee}</td><td>{_note(r)[:60]}</td></tr>"
+                    for ts, r, px, qty, fee in cols
+                ]
                 header_recent = (
                     "<tr><th>Time (UTC)</th><th>Side</th><th>Source</th>"
                     "<th>Price</th><th>Qty (BTC)</th><th>Fee</th><th>Note</th></tr>"
                 )
-                recent_html = ("<table border='1' cellspacing='0' cellpadding='4'>"
-                               f"{header_recent}{''.join(rows2)}</table>")
+                recent = ["<table border='1' cellspacing='0' cellpadding='4'>", header_recent, *rows2, "</table>"]
     except Exception as e:
-        recent_html = f"<p>Recent-trades section error: {e}</p>"
+        recent = [f"<p>Recent-trades section error: {e}</p>"]
 
-    html = f"""<!doctype html>
+    head = f"""<!doctype html>
 <html><head><meta charset="utf-8"><title>Baseline Overlay</title>
 <meta http-equiv="refresh" content="120">
 </head>
@@ -389,51 +661,45 @@ def write_html(out_png: str, eq: pd.DataFrame, trades_window: pd.DataFrame, all_
 <p><img src="{os.path.basename(out_png)}" style="max-width:100%;height:auto;border:1px solid #ddd"/></p>
 
 <h3>Trades in window</h3>
-{table}
-
-<h3>Recent trades (last 48 hours)</h3>
-{recent_html}
-</body></html>"""
-    Path(out_html).write_text(html, encoding="utf-8")
+"""
+    mid = "\n\n<h3>Recent trades (last 48 hours)</h3>\n"
+    # page = head + window table + recent table, written chunk by chunk
+    _write_atomic(out_html, [head, *table, mid, *recent, "\n</body></html>"])
     print(f"[overlay] wrote HTML: {out_html}")
 
-header_week_ext = (
-    "<tr><th>Time (UTC)</th><th>Side</th><th>Source</th>"
-    "<th>Price</th><th>Qty (BTC)</th><th>Fee</th><th>Note</th>"
-    "<th>Cash &rarr;</th><th>BTC &rarr;</th><th>Equity &rarr;</th><th>Notional</th></tr>"
-)
-
 # ------- weekly report ----------
-def write_weekly_report(eq: pd.DataFrame, trades: pd.DataFrame) -> None:
+def weekly_window(eq: pd.DataFrame) -> Tuple[pd.Timestamp, pd.Timestamp]:
+    """Full last 7 calendar days (UTC) up to the last equity timestamp, inclusive of both endpoints."""
+    end_ts = pd.to_datetime(eq["ts"].max(), errors="coerce")
+    if end_ts.tzinfo is None:
+        end_ts = end_ts.tz_localize("UTC")
+    else:
+        end_ts = end_ts.tz_convert("UTC")
+    s_utc = (end_ts - pd.Timedelta(days=7)).floor("D")
+    e_utc = end_ts.ceil("D")  # push to end-of-day so late trades are included
+    return s_utc, e_utc
+
+def write_weekly_report(eq: pd.DataFrame, trades_week: pd.DataFrame) -> None:
     """
     Weekly report with start/end balances (cash, BTC, equity) + last-7d trades.
+    `trades_week` is the enriched trades already cut to weekly_window(eq).
     Writes: state/weekly_report_preview.html
     """
     out_html = os.path.join(STATE_DIR, "weekly_report_preview.html")
 
     if eq.empty:
-        Path(out_html).write_text("<h3>No equity data for weekly report.</h3>", encoding="utf-8")
+        _write_atomic(out_html, "<h3>No equity data for weekly report.</h3>")
         print(f"[overlay] wrote weekly report: {out_html}")
         return
 
-    # 7-day window (UTC) based on the last equity timestamp
-    end_ts = pd.to_datetime(eq["ts"].max(), errors="coerce")
-    if end_ts.tzinfo is None:
-        end_ts = end_ts.tz_localize("UTC")
-    else:
-        end_ts = end_ts.tz_convert("UTC")
-
-    # Include the full last 7 calendar days, inclusive of both endpoints
-    s_utc = (end_ts - pd.Timedelta(days=7)).floor("D")
-    e_utc = end_ts.ceil("D")  # push to end-of-day so late trades are included
+    s_utc, e_utc = weekly_window(eq)
 
     # balance snapshots from equity rows in that window (fallback to last)
-    eqw = eq.copy()
-    eqw["ts"] = pd.to_datetime(eqw["ts"], utc=True, errors="coerce")
-    eqw = eqw.dropna(subset=["ts"])
-    eqw_win = eqw[(eqw["ts"] >= s_utc) & (eqw["ts"] <= e_utc)].copy()
+    s_i8, e_i8 = s_utc.value, e_utc.value
+    eq_i8 = _ts_ns(eq["ts"])
+    eqw_win = eq[(eq_i8 >= s_i8) & (eq_i8 <= e_i8)]
     if eqw_win.empty:
-        eqw_win = eqw.tail(1).copy()
+        eqw_win = eq.tail(1)
     snap_start, snap_end = eqw_win.iloc[0], eqw_win.iloc[-1]
 
     def vals(row):
@@ -449,41 +715,19 @@ def write_weekly_report(eq: pd.DataFrame, trades: pd.DataFrame) -> None:
     chg_usd = eq1 - eq0
     chg_pct = (chg_usd / eq0 * 100.0) if eq0 else 0.0
 
-    # ---- last 7d trades (USE ENRICHED 'trades' PASSED IN) ----
+    # ---- last 7d trades (enriched, windowed by main) ----
     trw = pd.DataFrame()
-    if trades is not None and not trades.empty:
-        t2 = trades.copy()
-        t2["_ts_utc"] = pd.to_datetime(t2["ts"], utc=True, errors="coerce")
-        t2 = t2.dropna(subset=["_ts_utc"])
-        trw = t2[(t2["_ts_utc"] >= s_utc) & (t2["_ts_utc"] <= e_utc)].sort_values("_ts_utc", ascending=False)
+    if trades_week is not None and not trades_week.empty:
+        trw = trades_week.sort_values("ts", ascending=False)
 
     # Debug print -> will show you if the trades are in range or not
     print(f"[overlay] weekly window: {s_utc} → {e_utc} | trades in week: {len(trw)}")
 
     if not trw.empty:
-        rows = []
-        for _, r in trw.head(40).iterrows():  # cap rows for readability
-            rows.append(
-                f"<tr><td>{pd.to_datetime(r['_ts_utc']).strftime('%Y-%m-%d %H:%M')}</td>"
-                f"<td>{r.get('side','')}</td><td>{_src(r)}</td>"
-                f"<td>{_fmt_money(r.get('price'))}</td>"
-                f"<td>{_fmt_btc(r.get('qty_btc', r.get('qty')))}</td>"
-                f"<td>{_fmt_fee(r.get('fee_usd'))}</td>"
-                f"<td>{_note(r)[:100]}</td>"
-                f"<td>{_fmt_money(r.get('cash_after'))}</td>"
-                f"<td>{_fmt_btc(r.get('btc_after'))}</td>"
-                f"<td>{_fmt_money(r.get('equity_after'))}</td>"
-                f"<td>{_fmt_money(r.get('notional'))}</td></tr>"
-            )
-        trades_html = (
-            "<table border='1' cellspacing='0' cellpadding='4'>"
-            "<tr><th>Time (UTC)</th><th>Side</th><th>Source</th>"
-            "<th>Price</th><th>Qty (BTC)</th><th>Fee</th><th>Note</th>"
-            "<th>Cash &rarr;</th><th>BTC &rarr;</th><th>Equity &rarr;</th><th>Notional</th></tr>"
-            + "".join(rows) + "</table>"
-        )
+        rows = _trade_rows_ext(trw.head(40), note_max=100)  # cap rows for readability
+        trades_html = ["<table border='1' cellspacing='0' cellpadding='4'>", TRADE_HEADER_EXT, *rows, "</table>"]
     else:
-        trades_html = "<p>No trades in the last 7 days.</p>"
+        trades_html = ["<p>No trades in the last 7 days.</p>"]
 
     bal_html = f"""
     <table border='1' cellspacing='0' cellpadding='6'>
@@ -501,48 +745,75 @@ def write_weekly_report(eq: pd.DataFrame, trades: pd.DataFrame) -> None:
     """
 
     img_name = "baseline_overlay_latest.png"
-    html = f"""<!doctype html>
+    head = f"""<!doctype html>
 <html><head><meta charset="utf-8"><title>Weekly Report</title></head>
 <body>
 <h2>Weekly Report — {s_utc.date()} → {e_utc.date()}</h2>
 {bal_html}
 <h3>Trades (last 7 days)</h3>
-{trades_html}
+"""
+    tail = f"""
 <hr/>
 <p><b>Overlay:</b></p>
 <p><img src="{img_name}" style="max-width:100%;height:auto;border:1px solid #ddd"/></p>
 </body></html>"""
-    Path(out_html).write_text(html, encoding="utf-8")
+    # page = head + table chunks + tail, written chunk by chunk
+    _write_atomic(out_html, [head, *trades_html, tail])
     print(f"[overlay] wrote weekly report: {out_html}  |  trades in week: {len(trw)}  |  window: {s_utc} → {e_utc}")
 
+# ---------- run cache ----------
+CACHE_KEY = os.path.join(STATE_DIR, ".overlay_cache_key")
+OUTPUTS   = [os.path.join(STATE_DIR, n) for n in ("baseline_overlay_latest.png",
+             "baseline_summary_with_trades.html", "weekly_report_preview.html")]
+
+def _inputs_key() -> str:
+    """Fingerprint of everything the outputs depend on: both CSVs' (mtime, size) and the env knobs."""
+    parts = []
+    for path in (EQ_CSV, TRADES_CSV):
+        try:
+            st = os.stat(path)
+            parts.append(f"{st.st_mtime_ns}:{st.st_size}")
+        except OSError:
+            parts.append("-")
+    parts += [str(DCA_LOT), OVERLAY]
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+def _write_key(key: str) -> None:
+    _write_atomic(CACHE_KEY, key)   # a crashed run never leaves a half-written key
+
 # ---------- main ----------
 def main():
+    key = _inputs_key()
+    if (Path(CACHE_KEY).exists() and Path(CACHE_KEY).read_text(encoding="utf-8").strip() == key
+            and all(Path(p).exists() for p in OUTPUTS)):
+        print("[overlay] inputs unchanged; outputs are up to date")
+        return
+
     eq_full = load_equity()
     if eq_full.empty:
         raise SystemExit("[overlay] no equity rows")
 
-    end = eq_full["ts"].max()
-    # If your env var is OVERLAY_DAYS, set OVERLAY = os.getenv("OVERLAY_DAYS","all") above.
-    if OVERLAY == "all":
-        eq = eq_full.copy()
+    if OVERLAY_DAYS is None:
+        eq = eq_full   # read-only below, no copy needed
     else:
-        try:
-            days = int(OVERLAY)
-        except Exception:
-            days = 30
-        start = end - pd.Timedelta(days=days)
-        eq = eq_full[eq_full["ts"] >= start].copy()
+        # eq_full is sorted, so its last ts is the end; compare on the raw datetime64 values
+        start = eq_full["ts"].iloc[-1] - pd.Timedelta(days=OVERLAY_DAYS)
+        eq = eq_full[eq_full["ts"].values >= start.asm8]
+        eq.index = pd.RangeIndex(len(eq))   # fresh frame from the mask; no reset_index copy
 
-    # 1) parse trades robustly (handles ISO, epoch s/ms, scientific)
-    trades_all = parse_all_trades_utc()
-    # compute running balances for richer tables
-    trades_all = enrich_trades_with_balances(trades_all, eq_full)
+    # 1) parse trades robustly (handles ISO, epoch s/ms, scientific) and compute
+    #    running balances for richer tables; reused from the cache when unchanged
+    trades_all = load_trades(eq_full)
 
     # 2) window for plotting = equity window ±7 days
-    buf   = pd.Timedelta(days=7)
-    s_win = pd.Timestamp(eq["ts"].min()).tz_convert("UTC") - buf
-    e_win = pd.Timestamp(eq["ts"].max()).tz_convert("UTC") + buf
-    trades_win = trades_all[(trades_all["ts"] >= s_win) & (trades_all["ts"] <= e_win)].copy()
+    # (int64 ns compares; eq is sorted, so its first/last rows are min/max)
+    eq_i8 = _ts_ns(eq["ts"])
+    s_i8, e_i8 = eq_i8[0] - WEEK_NS, eq_i8[-1] + WEEK_NS
+    # ... and the weekly-report window, both masks from one pass over the trade timestamps
+    s_week, e_week = weekly_window(eq_full)
+    in_win, in_week = _two_windows(_ts_ns(trades_all["ts"]), s_i8, e_i8, s_week.value, e_week.value)
+    trades_win = trades_all[in_win]
+    s_win, e_win = pd.Timestamp(s_i8, tz="UTC"), pd.Timestamp(e_i8, tz="UTC")
     print(f"[overlay] trades in window: {len(trades_win)}  | window: {s_win} -> {e_win}")
 
     # 3) benchmarks and outputs
@@ -550,7 +821,14 @@ def main():
     out_png = os.path.join(STATE_DIR, "baseline_overlay_latest.png")
     plot(eq, trades_win, hold, dca, out_png)
     write_html(out_png, eq, trades_win, trades_all)
-    write_weekly_report(eq_full, trades_all)
+    write_weekly_report(eq_full, trades_all[in_week])
+    _write_key(key)
 
 if __name__ == "__main__":
     main()
+    while DAEMON_SECS > 0:   # the run cache makes idle ticks cheap
+        time.sleep(DAEMON_SECS)
+        try:
+            main()
+        except (Exception, SystemExit) as e:   # one bad tick must not end the daemon
+            print(f"[overlay] tick failed: {type(e).__name__}: {e}")
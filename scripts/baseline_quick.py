@@ -1,6 +1,8 @@
-import os, sys, io
+import os, sys, time
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use("Agg")  # headless; only writes a PNG
 import matplotlib.pyplot as plt
 
 STATE_DIR = os.path.join(".", "state")
@@ -14,11 +16,11 @@ def pick_date_col(df):
     for c in candidates:
         if c in df.columns: 
             return c
-    # fallback: best-parsable column
+    # fallback: best-parsable column, scored on a sample (the winner is parsed in full later)
     best, score = None, 0
     for c in df.columns:
         try:
-            parsed = pd.to_datetime(df[c], errors="coerce")
+            parsed = pd.to_datetime(df[c].head(1000), errors="coerce", cache=True)
             s = parsed.notna().mean()
             if s > score:
                 best, score = c, s
@@ -31,12 +33,33 @@ def pick_first(df, names):
         if n in df.columns: return n
     return None
 
+def fetch_btc_close(start, end, date_col):
+    # reuse a parquet copy of the download for an hour; the network fetch is most of the run time
+    cache = os.path.join(STATE_DIR, "cache", f"btc_usd_{start}_{end}.parquet")
+    if os.path.exists(cache) and time.time() - os.path.getmtime(cache) < 3600:
+        try:
+            return pd.read_parquet(cache).rename(columns={"date": date_col})
+        except Exception:
+            pass  # unreadable cache: fetch again
+    import yfinance as yf
+    px = yf.download("BTC-USD", start=start, end=end, progress=False)["Close"].rename("close").to_frame()
+    px = px.reset_index().rename(columns={"Date": "date"})
+    try:
+        os.makedirs(os.path.dirname(cache), exist_ok=True)
+        px.to_parquet(cache, index=False, compression="zstd")
+    except Exception:
+        pass  # cache is best-effort (no pyarrow, read-only state dir, ...)
+    return px.rename(columns={"date": date_col})
+
 if not os.path.exists(EQ_PATH):
     sys.exit(f"? Missing {EQ_PATH}. Run your agent once to generate it.")
 
-# try utf-8 then utf-16
+# try utf-8 (pyarrow's multithreaded reader when installed, else the C engine) then utf-16
 try:
-    df = pd.read_csv(EQ_PATH)
+    try:
+        df = pd.read_csv(EQ_PATH, engine="pyarrow")
+    except (ImportError, ValueError):
+        df = pd.read_csv(EQ_PATH)
 except UnicodeError:
     df = pd.read_csv(EQ_PATH, encoding="utf-16")
 
@@ -45,7 +68,8 @@ df.columns = [c.strip().lower() for c in df.columns]
 date_col = pick_date_col(df)
 if not date_col:
     sys.exit("? Could not detect a date/timestamp column. Rename or add one (e.g., date/timestamp/ts_dt).")
-df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
+if not pd.api.types.is_datetime64_any_dtype(df[date_col]):  # pyarrow may have parsed it already
+    df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
 df = df.dropna(subset=[date_col]).sort_values(by=date_col).reset_index(drop=True)
 
 equity_col = pick_first(df, ["equity","total_equity","portfolio_equity","portfolio_value","nav","value"])
@@ -62,12 +86,15 @@ if not equity_col:
 price_col = pick_first(df, ["price","close","btc_price","btc_close","btc_usd"])
 if price_col is None:
     try:
-        import yfinance as yf
         start = df[date_col].min().strftime("%Y-%m-%d")
         end   = (df[date_col].max() + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
-        px = yf.download("BTC-USD", start=start, end=end, progress=False)["Close"].rename("close").to_frame()
-        px = px.reset_index().rename(columns={"Date": date_col})
-        df = pd.merge_asof(df.sort_values(date_col), px.sort_values(date_col), on=date_col)
+        px = fetch_btc_close(start, end, date_col)
+        # backward as-of join (df is already date-sorted): last close at or before each row
+        px = px.sort_values(date_col)
+        i = np.searchsorted(px[date_col].to_numpy("datetime64[ns]"),
+                            df[date_col].to_numpy("datetime64[ns]"), side="right") - 1
+        df["close"] = px["close"].to_numpy(float)[np.maximum(i, 0)] if len(px) else np.nan
+        df.loc[i < 0, "close"] = np.nan
         price_col = "close"
     except Exception as e:
         sys.exit(f"? No price column and failed to fetch BTC-USD: {e}")
@@ -84,15 +111,18 @@ first_price = float(df[price_col].iloc[0])
 hold_qty = initial_cash / first_price
 df["hold_equity"] = hold_qty * df[price_col]
 
-start_date = df[date_col].iloc[0]
-dca_dates = pd.date_range(start=start_date, end=df[date_col].iloc[-1], freq="7D")
-dca_idx = set(df.index[df[date_col].isin(dca_dates)].tolist())
-dca_qty, dca_cash = 0.0, initial_cash
-for i, row in df.iterrows():
-    if i in dca_idx and dca_cash >= dca_lot_usd:
-        dca_qty  += dca_lot_usd / float(row[price_col])
-        dca_cash -= dca_lot_usd
-df["dca_equity"] = dca_cash + dca_qty * df[price_col]
+# weekly buys land on the first row at/after each 7-day mark; stop once cash can't cover a lot
+ts    = df[date_col].to_numpy("datetime64[ns]")
+price = df[price_col].to_numpy(float)
+dca_times = pd.date_range(start=df[date_col].iloc[0], end=df[date_col].iloc[-1], freq="7D")
+buy_idx = np.unique(np.searchsorted(ts, dca_times.to_numpy("datetime64[ns]"), side="left"))
+buy_idx = buy_idx[buy_idx < len(ts)][: int(initial_cash // dca_lot_usd)]
+dca_qty = np.zeros(len(ts))
+dca_qty[buy_idx] = dca_lot_usd / price[buy_idx]
+np.cumsum(dca_qty, out=dca_qty)
+# buys made so far at each row = number of buy rows <= it
+n_buys = np.searchsorted(buy_idx, np.arange(len(ts)), side="right")
+df["dca_equity"] = (initial_cash - dca_lot_usd * n_buys) + dca_qty * price
 
 hybrid_final = float(df[equity_col].iloc[-1])
 hold_final   = float(df["hold_equity"].iloc[-1])
@@ -112,19 +142,18 @@ summary = {
 }
 
 plt.figure(figsize=(11,6))
-plt.plot(df[date_col], df[equity_col], label="Hybrid (Your Agent)")
-plt.plot(df[date_col], df["hold_equity"], label="Buy & Hold")
-plt.plot(df[date_col], df["dca_equity"], label="Weekly DCA ($500)")
-plt.title("Equity Curve  Hybrid vs Hold vs DCA")
+plt.plot(df[date_col], df[equity_col], label="Hybrid (Your Agent)", rasterized=True)
+plt.plot(df[date_col], df["hold_equity"], label="Buy & Hold", rasterized=True)
+plt.plot(df[date_col], df["dca_equity"], label="Weekly DCA ($500)", rasterized=True)
+plt.title("Equity Curve — Hybrid vs Hold vs DCA")
 plt.xlabel("Date"); plt.ylabel("Equity (USD)")
 plt.legend(); plt.tight_layout()
 plt.savefig(OUT_PNG, dpi=150)
 
-html = io.StringIO()
-html.write("<h2>Baseline Comparison Summary</h2><table border='1' cellpadding='6' cellspacing='0'>")
-for k,v in summary.items(): html.write(f"<tr><td><b>{k}</b></td><td>{v}</td></tr>")
-html.write("</table><p><img src='baseline_compare.png' style='max-width:100%;height:auto;'/></p>")
-with open(OUT_HTML, "w", encoding="utf-8") as f: f.write(html.getvalue())
+rows = "".join(f"<tr><td><b>{k}</b></td><td>{v}</td></tr>" for k,v in summary.items())
+html = ("<h2>Baseline Comparison Summary</h2><table border='1' cellpadding='6' cellspacing='0'>"
+        f"{rows}</table><p><img src='baseline_compare.png' style='max-width:100%;height:auto;'/></p>")
+with open(OUT_HTML, "w", encoding="utf-8") as f: f.write(html)
 
 print("? Wrote:", OUT_PNG)
 print("? Wrote:", OUT_HTML)
@@ -12,19 +12,21 @@ out    = HIST / "v2_trades_input.csv"
 if not master.exists():
     raise SystemExit(f"[ERR] Missing {master} – run rebuild_master_ledger.py first")
 
-df = pd.read_csv(master, parse_dates=["Time (UTC)"])
-
 # Map master ledger -> v2 input
-v2 = pd.DataFrame({
-    "ts_dt":        df["Time (UTC)"],
-    "side":         df["Side"],
-    "price":        df["Price"],
-    "qty_btc":      df["Qty"],
-    "fee_usd":      df["Fee"],
-    "note":         df["Note"],
-    "equity_after": df["equity_after"],
-})
+V2_COLS = {
+    "Time (UTC)":   "ts_dt",
+    "Side":         "side",
+    "Price":        "price",
+    "Qty":          "qty_btc",
+    "Fee":          "fee_usd",
+    "Note":         "note",
+    "equity_after": "equity_after",
+}
+
+# parse only the mapped columns, rename in place and let to_csv pick the order (no column copies)
+v2 = pd.read_csv(master, usecols=list(V2_COLS), parse_dates=["Time (UTC)"])
+v2.rename(columns=V2_COLS, inplace=True)
 
 out.parent.mkdir(parents=True, exist_ok=True)
-v2.to_csv(out, index=False)
+v2.to_csv(out, columns=list(V2_COLS.values()), index=False)
 print(f"[OK] Wrote {out} with {len(v2)} rows")
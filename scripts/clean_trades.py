@@ -8,31 +8,37 @@ STATE_DIR   = os.getenv("STATE_DIR","state")
 TRADES_CSV  = os.path.join(STATE_DIR,"trades.csv")
 OUT_CSV     = TRADES_CSV  # overwrite in place
 COLUMNS_OUT = ["ts","side","source","reason","price","qty_btc","fee_usd","note","confidence"]
-
-def _parse_ts(s):
-    # Accept ISO, epoch seconds, or epoch ms; force UTC
-    s = str(s).strip()
-    if not s:
-        return pd.NaT
-    try:
-        v = float(s)
-        if v > 1e12:  # ms
-            return pd.to_datetime(int(v), unit="ms", utc=True, errors="coerce")
-        if v > 1e9:   # s
-            return pd.to_datetime(int(v), unit="s", utc=True, errors="coerce")
-    except Exception:
-        pass
-    return pd.to_datetime(s, utc=True, errors="coerce")
-
-def _canon_source(x:str) -> str:
-    x = ("" if pd.isna(x) else str(x)).strip()
-    return x.upper()
+COLUMNS_IN  = set(COLUMNS_OUT) | {"ts_utc","qty"}  # everything main() reads; other columns are dropped anyway
+
+def _parse_ts(col: pd.Series) -> pd.Series:
+    # Accept ISO, epoch seconds, or epoch ms; force UTC.
+    # Vectorized: one numeric pass splits ms / s rows, the rest go through one string parse.
+    raw = col.astype(str).str.strip()
+    v = pd.to_numeric(raw, errors="coerce")
+    fin = np.isfinite(v)
+    ms, sec = fin & (v > 1e12), fin & (v > 1e9) & (v <= 1e12)
+    out = pd.Series(pd.NaT, index=col.index, dtype="datetime64[ns, UTC]")
+    if ms.any():
+        out[ms] = pd.to_datetime(np.trunc(v[ms]).astype("int64"), unit="ms", utc=True, errors="coerce")
+    if sec.any():
+        out[sec] = pd.to_datetime(np.trunc(v[sec]).astype("int64"), unit="s", utc=True, errors="coerce")
+    rest = ~(ms | sec) & (raw != "")
+    if rest.any():
+        # cache=True: repeated stamps are parsed once
+        out[rest] = pd.to_datetime(raw[rest], utc=True, errors="coerce", format="mixed", cache=True)
+    return out
+
+def _per_value(col: pd.Series, fn) -> pd.Series:
+    # side/source hold a handful of distinct values: apply fn once per value, then take
+    codes, uniq = pd.factorize(col, use_na_sentinel=False)
+    return pd.Series(np.array([fn(x) for x in uniq], dtype=object)[codes], index=col.index)
 
 def main():
     if not Path(TRADES_CSV).exists():
         raise SystemExit(f"missing {TRADES_CSV}")
 
-    df = pd.read_csv(TRADES_CSV, dtype=str)
+    # only parse the columns we use (dtype=str keeps the C engine: pyarrow turns nulls into "None")
+    df = pd.read_csv(TRADES_CSV, dtype=str, usecols=lambda c: c.strip().lower() in COLUMNS_IN)
     df.columns = [c.strip().lower() for c in df.columns]
 
     # unify timestamp column
@@ -40,12 +46,13 @@ def main():
         df["ts"] = df["ts_utc"]
 
     # parse ts and keep a copy for formatting later
-    df["ts"] = df["ts"].map(_parse_ts)
+    df["ts"] = _parse_ts(df["ts"])
     df = df.dropna(subset=["ts"]).copy()
 
     # normalize core fields
-    df["side"]   = df.get("side","").astype(str).str.lower().str.strip()
-    df["source"] = df.get("source", df.get("reason","")).map(_canon_source)
+    df["side"]   = _per_value(df.get("side",""), lambda x: str(x).lower().strip())
+    df["source"] = _per_value(df.get("source", df.get("reason","")),
+                              lambda x: ("" if pd.isna(x) else str(x)).strip().upper())
     df["reason"] = df.get("reason","").fillna("").astype(str)
 
     # choose qty_btc if present else qty
@@ -67,30 +74,27 @@ def main():
     df.loc[m_missing_fee & (df["source"]=="DCA"), "fee_usd"] = 0.02
 
     # ---- de-duplication (exact and near-duplicate within ±5s) ----
-    # (i) exact dupes on exact ts + side + source + reason + price + qty_btc
+    # same side/source/reason/price/qty within 5s (ts floored to 5s, price to cents, qty to 1e-8).
+    # An exact dupe is also a near dupe, and keep="last" on the near key keeps the same row the
+    # old exact-then-near passes did, so one hashed pass over a small key frame does both.
     df = df.sort_values("ts")
-    df = df.drop_duplicates(subset=["ts","side","source","reason","price","qty_btc"], keep="last")
-
-    # (ii) near-dup: same side/source/reason/price/qty within 5s (round ts to 5s)
-    ts5 = (df["ts"].astype("int64") // 5_000_000_000) * 5_000_000_000  # ns resolution
-    df["_ts_5s"] = pd.to_datetime(ts5, utc=True)
-    df["_price_r"] = df["price"].round(2)
-    df["_qty_r"]   = df["qty_btc"].round(8)
-    df = df.drop_duplicates(subset=["_ts_5s","side","source","reason","_price_r","_qty_r"], keep="last")
-    df = df.drop(columns=["_ts_5s","_price_r","_qty_r"], errors="ignore")
-
-    # final ordering/formatting
-    out = pd.DataFrame(columns=COLUMNS_OUT)
-    out["ts"]         = df["ts"].dt.tz_convert("UTC").dt.strftime("%Y-%m-%dT%H:%M:%SZ")
-    out["side"]       = df["side"]
-    out["source"]     = df["source"]
-    out["reason"]     = df["reason"]
-    out["price"]      = df["price"]
-    out["qty_btc"]    = df["qty_btc"]
-    out["fee_usd"]    = df["fee_usd"]
-    out["note"]       = df["note"]
-    out["confidence"] = df["confidence"]
-
+    key = pd.DataFrame({
+        "ts5":    df["ts"].astype("int64").to_numpy() // 5_000_000_000,
+        "side":   df["side"].to_numpy(),
+        "source": df["source"].to_numpy(),
+        "reason": df["reason"].to_numpy(),
+        "price":  df["price"].round(2).to_numpy(),
+        "qty":    df["qty_btc"].round(8).to_numpy(),
+    })
+    df = df[~key.duplicated(keep="last").to_numpy()]
+
+    # final ordering/formatting: one frame from plain arrays, in COLUMNS_OUT order
+    # numpy formats whole seconds with a trailing "Z" itself -- no per-row strftime
+    ts_s = df["ts"].dt.tz_convert("UTC").to_numpy("datetime64[s]")
+    out = pd.DataFrame({"ts": np.datetime_as_string(ts_s, unit="s", timezone="UTC"),
+                        **{c: df[c].to_numpy() for c in COLUMNS_OUT[1:]}})
+
+    # pandas' writer only: engine.py/append_trade.py append rows in the same text format
     out.to_csv(OUT_CSV, index=False)
     print(f"[clean_trades] wrote {OUT_CSV} rows: {len(out)}")
 
@@ -1,10 +1,16 @@
 import os
 from pathlib import Path
+import numpy as np
 import pandas as pd
 import matplotlib
 matplotlib.use("Agg")  # headless
 import matplotlib.pyplot as plt
 
+try:
+    from scripts._balance_kernel import run_balances
+except ImportError:
+    from _balance_kernel import run_balances  # type: ignore
+
 ROOT   = Path(os.getenv("PROJECT_ROOT", Path.cwd()))
 STATE  = ROOT / "state"
 OUTDIR = STATE / "overlays"
@@ -30,10 +36,8 @@ if CFG.exists():
 if not LEDGER.exists():
     raise SystemExit(f"[ERR] Missing {LEDGER}")
 
-df = pd.read_csv(LEDGER)
-
-# column auto-detect
-cols = {c.lower().strip(): c for c in df.columns}
+# column auto-detect from the header alone, then parse just those columns
+cols = {c.lower().strip(): c for c in pd.read_csv(LEDGER, nrows=0).columns}
 def pick(*opts):
     for o in opts:
         k = o.lower()
@@ -50,33 +54,35 @@ for need in [ts, side, price, qty]:
     if need is None:
         raise SystemExit("[ERR] trades.csv missing required columns")
 
+use = [c for c in (ts, side, price, qty, fee) if c]
+try:
+    df = pd.read_csv(LEDGER, usecols=use, engine="pyarrow")  # pyarrow is optional
+except (ImportError, ValueError):
+    df = pd.read_csv(LEDGER, usecols=use)
+
 df = df.dropna(subset=[ts]).copy()
-df[ts] = pd.to_datetime(df[ts], utc=True, errors="coerce")
+# pyarrow may already have parsed the column; only text needs another pass through to_datetime
+if isinstance(df[ts].dtype, pd.DatetimeTZDtype):
+    df[ts] = df[ts].dt.tz_convert("UTC")
+elif pd.api.types.is_datetime64_dtype(df[ts]):
+    df[ts] = df[ts].dt.tz_localize("UTC")
+else:
+    df[ts] = pd.to_datetime(df[ts], utc=True, errors="coerce")
 df = df.sort_values(ts)
 
-cash = start_cash
-btc  = start_btc
-equity_points = []
-
-for _, r in df.iterrows():
-    p = float(r[price])
-    q = float(r[qty])
-    s = str(r[side]).upper()
-    f = float(r[fee]) if fee and not pd.isna(r[fee]) else 0.0
-
-    if s.startswith("B"):
-        cash -= p*q + f
-        btc  += q
-    elif s.startswith("S"):
-        cash += p*q - f
-        btc  -= q
-    equity = cash + btc * p
-    equity_points.append((r[ts], equity))
-
-if not equity_points:
+if df.empty:
     raise SystemExit("[ERR] No trade rows to plot")
 
-e = pd.DataFrame(equity_points, columns=["ts","equity"]).set_index("ts")
+# running balances via the shared kernel; sides go by first letter (B.../S...), others are no-ops
+p = df[price].to_numpy(float)
+q = df[qty].to_numpy(float)
+f = df[fee].fillna(0).to_numpy(float) if fee else np.zeros(len(df))
+s = df[side].astype(str).str.upper().str[:1].to_numpy()
+sign = np.where(s == "B", 1, np.where(s == "S", -1, 0)).astype(np.int8)
+cash, btc = run_balances(sign, p, q, f, start_cash, start_btc)
+equity = cash + btc * p
+
+e = pd.DataFrame({"ts": df[ts].array, "equity": equity}).set_index("ts")
 
 plt.figure(figsize=(12,5))
 plt.plot(e.index, e["equity"], label="Equity (USD)")
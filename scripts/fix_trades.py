@@ -38,7 +38,15 @@ ts_raw = df['ts'].astype(str).str.strip()
 ts_num = pd.to_numeric(ts_raw, errors='coerce')
 ts = pd.to_datetime(ts_num, unit='s', utc=True, errors='coerce')
 bad = ts.isna()
-ts.loc[bad] = pd.to_datetime(ts_raw[bad], utc=True, errors='coerce')
+# pandas would infer one format from the first string anyway; sniff the usual ISO shapes
+# up front so it goes straight to fixed-format strptime, and cache repeated stamps
+iso = ts_raw[bad & ~ts_raw.isin(['', 'nan', 'None'])]
+fmt = None
+for f in ('%Y-%m-%dT%H:%M:%S%z', '%Y-%m-%d %H:%M:%S%z', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S'):
+    if len(iso) and pd.notna(pd.to_datetime(iso.iat[0], format=f, errors='coerce')):
+        fmt = f
+        break
+ts.loc[bad] = pd.to_datetime(ts_raw[bad], utc=True, errors='coerce', format=fmt, cache=True)
 df['ts'] = ts
 
 # Build a safe subset for exact de-duplication
@@ -26,8 +26,11 @@ def to_dt(x):
     return pd.to_datetime(y, unit="ns", utc=True)
 
 dt=to_dt(s)
-df["ts_utc"]=dt
-df["ts_dt"]=dt.dt.tz_convert("UTC").dt.strftime("%Y-%m-%d %H:%M:%S")
-df=df[df["ts_utc"].dt.year.ge(2009)]  # drop any bogus epoch rows
+t64=dt.to_numpy("datetime64[ns]")                             # UTC wall time, NaT included
+keep=t64>=np.datetime64("2009-01-01")                         # drop any bogus epoch rows (and NaT)
+df=df.iloc[keep]
+df["ts_utc"]=dt[keep]
+txt=np.datetime_as_string(t64[keep], unit="s")                # 'YYYY-MM-DDTHH:MM:SS'
+df["ts_dt"]=pd.Series(txt, index=df.index).str.replace("T", " ", regex=False)  # ISO 'T' -> ' ', no per-row strftime
 df.to_csv(TR, index=False)
 print("? fixed trades.csv rows:", len(df))
@@ -9,9 +9,17 @@ Usage:
 
 import sys, shutil, datetime as dt
 from pathlib import Path
+import numpy as np
 import pandas as pd
+import matplotlib
+matplotlib.use("Agg")  # headless; only writes a PNG
 import matplotlib.pyplot as plt
 
+try:
+    from scripts._csv_cache import cached_read
+except ImportError:
+    from _csv_cache import cached_read  # type: ignore
+
 def utc_now() -> dt.datetime:
     return dt.datetime.now(dt.timezone.utc)
 
@@ -32,9 +40,13 @@ mode = sys.argv[1] if len(sys.argv) > 1 else "weekly"
 ts = utc_now().strftime("%Y%m%d_%H%M%S")
 out_html = REPORTS / f"{mode}_statement_{ts}.html"
 
+def read_ledger(path: Path) -> pd.DataFrame:
+    """read_csv, memoized in .{stem}.statement.parquet next to the CSV."""
+    return cached_read(path, "statement", pd.read_csv)
+
 # === Load CSV (with fallback) ===============================================
 try:
-    df = pd.read_csv(LIVE)
+    df = read_ledger(LIVE)
     print(f"✅ Loaded live ledger: {LIVE}")
 except Exception as e:
     print(f"⚠️ Failed to read live ledger: {e}")
@@ -54,7 +66,8 @@ if not BACKUP.exists() or (utc_now().weekday() == 6 and mode == "weekly"):
 
 # === Normalise / clean dataframe ============================================
 # Parse time as UTC, sort
-df["Time (UTC)"] = pd.to_datetime(df["Time (UTC)"], utc=True, errors="coerce")
+# ISO-8601 from our own writer: fixed-format C parser, repeated stamps parsed once
+df["Time (UTC)"] = pd.to_datetime(df["Time (UTC)"], utc=True, errors="coerce", format="ISO8601", cache=True)
 df.sort_values("Time (UTC)", inplace=True)
 
 # Ensure columns exist
@@ -75,29 +88,30 @@ if "equity_after" not in df.columns:
     df["equity_after"] = df["cash_after"] + df["btc_after"] * df["Price"]
     print("📈 Computed equity_after column")
 
-# === Select rows for this report ============================================
+# === Select rows and build display dataframe ================================
+DISPLAY_COLS = ["Time (UTC)", "Side", "Price", "Qty", "Fee",
+                "Reason", "Note", "cash_after", "btc_after", "equity_after"]
+
+# filter rows and project the display columns in one step: a single copy of just what's shown
+day_str = ""
 if mode == "daily":
     # Last calendar day with data
     last_ts = df["Time (UTC)"].dropna().max()
-    if pd.isna(last_ts):
-        df_rep = df.tail(60).copy()
-    else:
-        day_mask = df["Time (UTC)"].dt.date == last_ts.date()
-        df_rep = df[day_mask].copy()
-        # Fallback if somehow empty
-        if df_rep.empty:
-            df_rep = df.tail(60).copy()
+    df_disp = None
+    if pd.notna(last_ts):
+        day = last_ts.normalize()   # range compare on the datetime64 values, no per-row .dt.date
+        day_mask = (df["Time (UTC)"] >= day) & (df["Time (UTC)"] < day + pd.Timedelta(days=1))
+        day_str = day.strftime("%Y-%m-%d")
+        df_disp = df.loc[day_mask, DISPLAY_COLS].copy()
+    # Fallback if somehow empty
+    if df_disp is None or df_disp.empty:
+        df_disp = df[DISPLAY_COLS].tail(60).copy()
 else:
     # Weekly mode: show all history (your call earlier)
-    df_rep = df.copy()
+    df_disp = df[DISPLAY_COLS].copy()
 
-# Format display time
-df_rep["Time (UTC)"] = df_rep["Time (UTC)"].dt.strftime("%Y-%m-%d %H:%M:%S UTC")
-
-# === Build display dataframe ================================================
-cols = ["Time (UTC)", "Side", "Price", "Qty", "Fee",
-        "Reason", "Note", "cash_after", "btc_after", "equity_after"]
-df_disp = df_rep[cols].copy()
+# Format display time (on the private copy; df keeps its datetimes for the plot)
+df_disp["Time (UTC)"] = df_disp["Time (UTC)"].dt.strftime("%Y-%m-%d %H:%M:%S UTC")
 
 # Friendly column names
 df_disp.rename(columns={
@@ -106,33 +120,33 @@ df_disp.rename(columns={
     "equity_after": "Equity After"
 }, inplace=True)
 
+def trim8(s: pd.Series) -> pd.Series:
+    # 8 decimals without trailing zeros, formatted and trimmed column-wise
+    txt = np.char.mod("%.8f", s.to_numpy(dtype=np.float64))
+    return pd.Series(txt, index=s.index).str.rstrip("0").str.rstrip(".")
+
 # Basic formatting
 df_disp["Price"] = df_disp["Price"].round(2)
-df_disp["Qty"] = df_disp["Qty"].astype(float).map(lambda x: f"{x:.8f}".rstrip("0").rstrip("."))
+df_disp["Qty"] = trim8(df_disp["Qty"])
 df_disp["Fee"] = df_disp["Fee"].round(2)
 df_disp["Cash After"] = df_disp["Cash After"].round(2)
-df_disp["BTC After"] = df_disp["BTC After"].astype(float).map(lambda x: f"{x:.8f}".rstrip("0").rstrip("."))
+df_disp["BTC After"] = trim8(df_disp["BTC After"])
 df_disp["Equity After"] = df_disp["Equity After"].round(2)
 
 # === Optional equity plot for daily (only if enough data) ===================
 plot_html = ""
 if mode == "daily":
-    last_ts = df_rep["Time (UTC)"].dropna().max()
-    if pd.notna(last_ts):
-        day_str = last_ts[:10] if isinstance(last_ts, str) else last_ts.strftime("%Y-%m-%d")
-    else:
-        day_str = ""
     # Use original df (with datetime) to get time/equity for that day
-    dfd = df[df["Time (UTC)"].dt.strftime("%Y-%m-%d") == day_str] if day_str else df.iloc[0:0]
+    dfd = df[day_mask] if day_str else df.iloc[0:0]
     if len(dfd) >= 5:
         plt.figure(figsize=(8, 4))
-        plt.plot(dfd["Time (UTC)"], dfd["equity_after"])
+        plt.plot(dfd["Time (UTC)"], dfd["equity_after"], rasterized=True)
         plt.title(f"Equity Curve {day_str}")
         plt.xlabel("Time (UTC)")
         plt.ylabel("Equity (USD)")
         plot_path = PLOTS / f"equity_curve_{day_str}.png"
         plt.tight_layout()
-        plt.savefig(plot_path)
+        plt.savefig(plot_path, dpi=100)   # 8x4 in -> the 800px the <img> is shown at
         plt.close()
         plot_html = f'<h3>📈 Equity Curve ({day_str})</h3><img src="../plots/{plot_path.name}" width="800">'
 
@@ -153,18 +167,11 @@ td:nth-child(7) { text-align: left; } /* Note column */
 """
 
 # === Render table & header ===================================================
-table_html = df_disp.to_html(
-    index=False,
-    classes="dataframe data",
-    border=0,
-    justify="right",
-    escape=False,
-    na_rep=""
-)
-
 generated_at = utc_now().strftime("%Y-%m-%d %H:%M:%S UTC")
 
-html = f"""<!doctype html>
+# written piecewise: to_html streams the table into the file instead of returning one big string
+with out_html.open("w", encoding="utf-8", buffering=1024 * 1024) as f:
+    f.write(f"""<!doctype html>
 <html>
   <head>
     <meta charset="utf-8">
@@ -174,13 +181,22 @@ html = f"""<!doctype html>
   <body>
     <h1>BTC Trading Statement — {mode.title()} Report</h1>
     {plot_html}
-    {table_html}
+    """)
+    df_disp.to_html(
+        buf=f,
+        index=False,
+        classes="dataframe data",
+        border=0,
+        justify="right",
+        escape=False,
+        na_rep=""
+    )
+    f.write(f"""
     <div class="footer">
       Generated {generated_at} | Mode: {mode}
     </div>
   </body>
 </html>
-"""
+""")
 
-out_html.write_text(html, encoding="utf-8")
 print("✅ Statement written →", out_html)
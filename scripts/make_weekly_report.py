@@ -1,8 +1,19 @@
 #!/usr/bin/env python3
-import argparse, io, re, sys
+import argparse, csv, re, sys
 from pathlib import Path
 from datetime import datetime, timezone, timedelta
+import numpy as np
 import pandas as pd
+try:  # optional: Arrow-backed text columns; pandas' own string dtype otherwise
+    import pyarrow  # noqa: F401
+    _STR = "string[pyarrow]"
+except ImportError:
+    _STR = "string"
+
+try:
+    from scripts._csv_cache import cached_read, none_to_nan
+except ImportError:
+    from _csv_cache import cached_read, none_to_nan  # type: ignore
 
 CSS = """
 body{font:14px system-ui,-apple-system,Segoe UI,Roboto,Arial,sans-serif;padding:16px;color:#111}
@@ -15,17 +26,45 @@ h1{margin:0 0 6px 0;font-size:20px}
 .tbl tr:nth-child(even){background:#fcfcfc}
 """
 
+_HDR_RE = re.compile(r"(Time \(UTC\)|ts(_dt)?|Side|Price|Qty(_BTC)?)", re.I)
+# backfill/placeholder/test rows, matched with case=False (plain patterns keep Arrow strings in RE2)
+_BAD_NOTE   = r"backfill|placeholder"
+_BAD_REASON = r"^(?:engine|test|manual backfill)$"
+# exactly the characters re's \s matches, spelled as literals so Arrow's RE2 kernel accepts it as well
+_WS_RE  = "[\t-\r\x1c-\x20\x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000]+"
+
 def _read_trades(csv_path: Path) -> pd.DataFrame:
-    lines = csv_path.read_text(encoding="utf-8", errors="replace").splitlines()
+    # the header row is found in the first 50 lines (exports may carry a short prelude),
+    # so only a bounded head of the file is decoded for that
+    with csv_path.open("rb") as f:
+        head = f.read(64 * 1024)
+    lines = head.decode("utf-8", errors="replace").splitlines()
     if not lines:
         return pd.DataFrame()
     hdr_idx = 0
-    header_re = re.compile(r"(Time \(UTC\)|ts(_dt)?|Side|Price|Qty(_BTC)?)", re.I)
     for i, line in enumerate(lines[:50]):
-        if header_re.search(line):
+        if _HDR_RE.search(line):
             hdr_idx = i; break
-    buf = io.StringIO("\n".join(lines[hdr_idx:]))
-    return pd.read_csv(buf, engine="python", sep=None)
+    # header on the first line and comma-separated (the usual export): pyarrow's multithreaded
+    # parser straight from disk. A prelude, another delimiter or no pyarrow keeps the
+    # delimiter-sniffing python engine (pandas' pyarrow engine can't skip prelude rows).
+    try:
+        if hdr_idx == 0 and csv.Sniffer().sniff(lines[0]).delimiter == ",":
+            df = pd.read_csv(csv_path, engine="pyarrow")
+            obj = df.columns[df.dtypes == object]
+            for c in obj:
+                i = df[c].first_valid_index()
+                if i is not None and isinstance(df[c].at[i], bytes):
+                    raise ValueError(f"{c}: not UTF-8")  # pyarrow keeps it as bytes; decode below
+            return none_to_nan(df)
+    except (csv.Error, ImportError, ValueError):
+        pass
+    return pd.read_csv(csv_path, engine="python", sep=None, skiprows=hdr_idx,
+                       encoding="utf-8", encoding_errors="replace")
+
+def _load_trades(csv_path: Path) -> pd.DataFrame:
+    """_read_trades, memoized in .{stem}.weekly.parquet next to the CSV."""
+    return cached_read(csv_path, "weekly", _read_trades)
 
 def _normalize(df: pd.DataFrame) -> pd.DataFrame:
     if df.empty: return df
@@ -35,8 +74,8 @@ def _normalize(df: pd.DataFrame) -> pd.DataFrame:
     # timestamp -> ts_dt (UTC)
     ts_col = has("ts_dt","Time (UTC)","ts","timestamp","time")
     if ts_col is None: raise ValueError("No timestamp column found.")
-    ts = pd.to_datetime(df[ts_col], utc=True, errors="coerce") if ts_col.lower()!="ts" \
-         else pd.to_datetime(df[ts_col], unit="s", utc=True, errors="coerce")
+    ts = pd.to_datetime(df[ts_col], utc=True, errors="coerce", format="ISO8601", cache=True) \
+         if ts_col.lower()!="ts" else pd.to_datetime(df[ts_col], unit="s", utc=True, errors="coerce")
 
     def numcol(*names, default=None):
         name = has(*names)
@@ -51,12 +90,14 @@ def _normalize(df: pd.DataFrame) -> pd.DataFrame:
     notional = numcol("Notional","notional_usd", default=None)
     notional = notional.where(notional.notna(), price*qty)
 
-    side   = df.get(has("Side"), pd.Series("", index=df.index)).astype(str)
-    reason = df.get(has("Reason"), pd.Series("", index=df.index)).astype(str)
+    # string dtype so lower/contains/isin run as column kernels; missing cells keep the "nan" text astype(str) gave
+    def text(s): return s.astype(_STR).fillna("nan")
+    side   = text(df.get(has("Side"), pd.Series("", index=df.index)))
+    reason = text(df.get(has("Reason"), pd.Series("", index=df.index)))
 
     ccols = [c for c in df.columns if c.lower() in {"note","comment","comments"}]
-    note = (df[ccols[0]].astype(str) if ccols else pd.Series("", index=df.index, dtype="string")).fillna("")
-    note = note.where(note.str.len()>0, reason).fillna("").replace(r"\s+"," ", regex=True)
+    note = text(df[ccols[0]]) if ccols else pd.Series("", index=df.index, dtype=_STR)
+    note = note.where(note.ne(""), reason).fillna("").str.replace(_WS_RE, " ", regex=True)
 
     cash_after   = numcol("Cash After","cash_after")
     btc_after    = numcol("BTC After","btc_after")
@@ -103,9 +144,10 @@ def _format_range(title: str, df: pd.DataFrame) -> str:
 def _latest(df: pd.DataFrame, col: str):
     return df[col].dropna().iloc[-1] if col in df.columns and df[col].notna().any() else None
 
-def _to_html(dfw: pd.DataFrame, title: str) -> str:
+def _write_html(dfw: pd.DataFrame, title: str, out: Path) -> None:
     if dfw.empty:
-        return f"<!doctype html><meta charset='utf-8'><style>{CSS}</style><h1>{title}</h1><p>No rows in window.</p>"
+        out.write_text(f"<!doctype html><meta charset='utf-8'><style>{CSS}</style><h1>{title}</h1><p>No rows in window.</p>", encoding="utf-8")
+        return
 
     disp = dfw.rename(columns={"ts_dt":"Time (UTC)"}).copy()
     cols = ["Time (UTC)","Side","Reason","Price","Qty BTC","Notional","Fee (USD)","Fee %","Note","Cash After","BTC After","Equity After"]
@@ -115,9 +157,12 @@ def _to_html(dfw: pd.DataFrame, title: str) -> str:
         "Price":"{:,.2f}","Qty BTC":"{:,.8f}","Notional":"{:,.2f}","Fee (USD)":"{:,.2f}",
         "Fee %":"{:.2f}","Cash After":"{:,.2f}","BTC After":"{:,.8f}","Equity After":"{:,.2f}"
     }
+    # one isnan per column and a bound format call per cell, not a pandas apply + notna per cell
     for c,f in fmt.items():
         if c in disp.columns:
-            disp[c] = disp[c].apply(lambda x: f.format(x) if pd.notna(x) else "")
+            x = disp[c].to_numpy(dtype=np.float64)
+            spec = f.format
+            disp[c] = [spec(v) if ok else "" for v, ok in zip(x.tolist(), (~np.isnan(x)).tolist())]
 
     latest_price=_latest(dfw,"Price"); last_cash=_latest(dfw,"Cash After")
     last_btc=_latest(dfw,"BTC After"); last_equity=_latest(dfw,"Equity After"); fills=len(dfw)
@@ -135,7 +180,10 @@ def _to_html(dfw: pd.DataFrame, title: str) -> str:
   <div class="ts">Generated at {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')}</div>
 </div>
 """
-    return head + disp.to_html(index=False, classes="tbl", border=0, escape=False)
+    # stream the table straight into the file: no concatenated page string, no encoded copy of it
+    with out.open("w", encoding="utf-8", buffering=1024 * 1024) as f:
+        f.write(head)
+        disp.to_html(buf=f, index=False, classes="tbl", border=0, escape=False)
 
 def main():
     ap = argparse.ArgumentParser()
@@ -151,16 +199,14 @@ def main():
         a.out.write_text(f"<!doctype html><meta charset='utf-8'><style>{CSS}</style><h1>{a.title}</h1><p>No data.</p>", encoding="utf-8")
         return
 
-    df = _normalize(_read_trades(a.csv))
+    df = _normalize(_load_trades(a.csv))
     win = _rolling(df, a.days)
 
     # Drop backfill/placeholder/test rows to avoid fake cash swings
     if not win.empty:
-        low_note = win.get("Note","").astype(str).str.lower()
-        low_reason = win.get("Reason","").astype(str).str.lower()
         mask = ~(
-            low_note.str.contains(r"backfill|placeholder", na=False) |
-            low_reason.isin(["engine","test","manual backfill"])
+            win["Note"].str.contains(_BAD_NOTE, case=False, na=False) |
+            win["Reason"].str.contains(_BAD_REASON, case=False, na=False)
         )
         win = win.loc[mask].copy()
 
@@ -170,9 +216,8 @@ def main():
         win = win.sort_values("ts_dt", ascending=True,  kind="mergesort").reset_index(drop=True)
 
     title = _format_range(a.title, win) if not win.empty else a.title
-    html = _to_html(win, title)
     a.out.parent.mkdir(parents=True, exist_ok=True)
-    a.out.write_text(html, encoding="utf-8")
+    _write_html(win, title, a.out)
 
 if __name__ == "__main__":
     main()